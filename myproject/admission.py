@@ -0,0 +1,155 @@
+"""
+Admission control for expensive endpoints.
+
+Every guarded route belongs to an endpoint class (exports, search, writes).
+Each class has its own concurrency limit and a bounded wait queue; when the
+queue is full, or a waiter times out, the request is rejected with
+429 + Retry-After instead of tying up a worker.
+
+Non-write classes also draw from a shared pool that is smaller than the
+total capacity by ADMISSION_WRITE_RESERVE slots, so a burst of exports and
+searches can never take the capacity reserved for form saves and
+reservations.
+
+A streamed response keeps its slot until the body has been sent (or the
+client goes away), since that is where its query runs.
+
+Limits are per process: with several worker processes, each gets its own
+set of slots.
+"""
+import functools
+import threading
+
+from flask import Response, current_app, jsonify
+
+DEFAULT_LIMITS = {
+    # concurrency: requests running at once; queue: requests allowed to wait;
+    # timeout: seconds a request waits for a slot before it is rejected
+    "exports": {"concurrency": 4, "queue": 4, "timeout": 10},
+    "search": {"concurrency": 12, "queue": 16, "timeout": 5},
+    "writes": {"concurrency": 8, "queue": 32, "timeout": 15},
+}
+# exports + search (16) exceed the shared pool (TOTAL - WRITE_RESERVE = 12),
+# so the reserve is what stops them from taking every slot
+DEFAULT_TOTAL = 16
+DEFAULT_WRITE_RESERVE = 4
+
+WRITE_CLASS = "writes"
+
+
+class EndpointClass:
+    """
+    Semaphore with a bounded number of waiters.
+    """
+
+    def __init__(self, name, concurrency, queue, timeout):
+        self.name = name
+        self.timeout = timeout
+        self.max_waiting = queue
+        self.waiting = 0
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        # Fast path: free slot, no queueing
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self.waiting >= self.max_waiting:
+                return False
+            self.waiting += 1
+        try:
+            return self._slots.acquire(timeout=self.timeout if timeout is None else timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def release(self):
+        self._slots.release()
+
+
+class AdmissionController:
+    """
+    Holds one EndpointClass per configured class plus the shared pool that
+    non-write classes must also pass through.
+    """
+
+    def __init__(self, limits, total, write_reserve):
+        self.classes = {
+            name: EndpointClass(name, cfg["concurrency"], cfg["queue"], cfg["timeout"])
+            for name, cfg in limits.items()
+        }
+        self.shared = threading.BoundedSemaphore(max(1, total - write_reserve))
+
+    def enter(self, name):
+        """
+        Try to admit a request of class name. Returns True when admitted;
+        the caller must then call leave(name).
+        """
+        cls = self.classes[name]
+        if not cls.acquire():
+            return False
+        if name == WRITE_CLASS:
+            return True
+        if not self.shared.acquire(timeout=cls.timeout):
+            cls.release()
+            return False
+        return True
+
+    def leave(self, name):
+        if name != WRITE_CLASS:
+            self.shared.release()
+        self.classes[name].release()
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    """
+    Build the controller from app config on first use.
+    """
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                cfg = current_app.config
+                _controller = AdmissionController(
+                    cfg.get("ADMISSION_LIMITS", DEFAULT_LIMITS),
+                    cfg.get("ADMISSION_TOTAL", DEFAULT_TOTAL),
+                    cfg.get("ADMISSION_WRITE_RESERVE", DEFAULT_WRITE_RESERVE),
+                )
+    return _controller
+
+
+def limit(name):
+    """
+    Route decorator that admits the request through endpoint class name,
+    or answers 429 with Retry-After when the class is saturated.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get("ADMISSION_ENABLED", True):
+                return view(*args, **kwargs)
+            controller = get_controller()
+            if not controller.enter(name):
+                resp = jsonify({"success": False, "error": f"Too many {name} requests, please retry shortly"})
+                resp.status_code = 429
+                resp.headers["Retry-After"] = str(current_app.config.get("ADMISSION_RETRY_AFTER", 5))
+                return resp
+            held = False
+            try:
+                rv = view(*args, **kwargs)
+                # send_file responses (direct_passthrough) are already fully
+                # rendered, and werkzeug never runs their close callbacks
+                if isinstance(rv, Response) and rv.is_streamed and not rv.direct_passthrough:
+                    rv.call_on_close(functools.partial(controller.leave, name))
+                    held = True
+                return rv
+            finally:
+                if not held:
+                    controller.leave(name)
+        return wrapper
+    return decorator
@@ -1,29 +1,115 @@
 from flask import Flask, render_template, request, redirect, url_for, session, g, flash, jsonify, send_file
 import sqlite3, random, threading
+import click
 import datetime
+import hmac
+import itertools
 import json
-from io import BytesIO
-
-# Added libs for downloads
-import openpyxl
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+import tempfile
+
+# Export backends; openpyxl/reportlab are imported lazily on first download
+import exports
+import admission
+import dedupe
+import repository
+import profiles
+import assets
+import responses
+import maintenance
+import typeahead
+import idempotency
+import lifecycle
 
 app = Flask(__name__)
 app.secret_key = "your_secret_key"
 
 DATABASE = "users.db"
 
+# Cold-start budget checked by `flask --app app startup-budget`
+app.config.setdefault("STARTUP_BUDGET_SECONDS", 1.0)
+app.config.setdefault("STARTUP_BUDGET_RSS_MB", 64)
+
+# Admission control: per-class concurrency/queue limits (see admission.py)
+app.config.setdefault("ADMISSION_ENABLED", True)
+app.config.setdefault("ADMISSION_LIMITS", admission.DEFAULT_LIMITS)
+app.config.setdefault("ADMISSION_TOTAL", admission.DEFAULT_TOTAL)
+app.config.setdefault("ADMISSION_WRITE_RESERVE", admission.DEFAULT_WRITE_RESERVE)
+app.config.setdefault("ADMISSION_RETRY_AFTER", 5)
+
+# Exports are rendered into a spooled temp file and streamed from there;
+# anything larger than this many bytes spills to disk instead of memory
+app.config.setdefault("EXPORT_SPOOL_MAX_BYTES", 8 * 1024 * 1024)
+# Process pool size for large PDF reports (None = CPU count)
+app.config.setdefault("PDF_RENDER_WORKERS", None)
+# Bearer token accepted by /export/<fmt> for scripted pulls (admins can use their session)
+app.config.setdefault("EXPORT_API_TOKEN", None)
+
+# Coordinators per page on the admin dashboard
+app.config.setdefault("ADMIN_COORDINATORS_PER_PAGE", 20)
+
+# Fingerprinted /assets/ URLs and the build-assets command (see assets.py)
+app.config.setdefault("ASSET_IMAGE_WIDTHS", assets.DEFAULT_WIDTHS)
+assets.init_app(app)
+
+# orjson-backed JSON when available; gzip/brotli for responses over the threshold
+app.json = responses.FastJSONProvider(app)
+app.config.setdefault("COMPRESSION_ENABLED", True)
+app.config.setdefault("COMPRESSION_MIN_SIZE", 1024)
+responses.init_compression(app)
+
+# SQLite maintenance (see maintenance.py): task intervals in seconds, None disables
+app.config.setdefault("MAINTENANCE_SCHEDULER", True)
+app.config.setdefault("MAINTENANCE_SCHEDULE", maintenance.DEFAULT_SCHEDULE)
+app.config.setdefault("MAINTENANCE_VACUUM_PAGES", 0)  # pages per incremental vacuum, 0 = all free pages
+app.config.setdefault("MAINTENANCE_FULL_INTEGRITY_CHECK", False)
+# Storage tuning for read-heavy deployments; page_size changes apply via a one-off VACUUM in init_db
+app.config.setdefault("SQLITE_MMAP_SIZE", 0)
+app.config.setdefault("SQLITE_PAGE_SIZE", 4096)
+
+# /application_typeahead: answer from the in-process sorted number index
+# (typeahead.py); False queries the numeric_part index instead
+app.config.setdefault("TYPEAHEAD_IN_MEMORY", True)
+
+# How long /save_application remembers an Idempotency-Key (seconds)
+app.config.setdefault("IDEMPOTENCY_KEY_TTL", idempotency.KEY_TTL)
+
 # ---------------- Database Connection ----------------
+def open_db():
+    # Use detect_types to allow datetime parsing if needed; row_factory for named access
+    db = sqlite3.connect(DATABASE, timeout=10, detect_types=sqlite3.PARSE_DECLTYPES)
+    db.row_factory = sqlite3.Row
+    register_functions(db)
+    maintenance.configure_connection(db, app.config)
+    return db
+
+
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        # Use detect_types to allow datetime parsing if needed; row_factory for named access
-        db = g._database = sqlite3.connect(DATABASE, timeout=10, detect_types=sqlite3.PARSE_DECLTYPES)
-        db.row_factory = sqlite3.Row
+        db = g._database = open_db()
     return db
 
 
+def streamed_records(query, *args):
+    """
+    Run a repository query on its own connection, for streamed responses
+    that outlive the request (and the request's get_db() connection).
+    """
+    db = open_db()
+    try:
+        yield from query(db, *args)
+    finally:
+        db.close()
+
+
+def register_functions(db):
+    """
+    SQL functions used by queries and migrations.
+    """
+    db.create_function("fingerprint", 2, dedupe.fingerprint, deterministic=True)
+    db.create_function("mobile_fingerprint", 2, dedupe.mobile_fingerprint, deterministic=True)
+
+
 @app.teardown_appcontext
 def close_connection(exception):
     db = getattr(g, '_database', None)
@@ -39,15 +125,14 @@ def format_app_number(num):
 # Concurrency lock for safety (sqlite BEGIN IMMEDIATE used as DB-level lock as well)
 sequence_lock = threading.Lock()
 
-def reserve_new_application_number(coordinator_name=None):
+def reserve_new_application_number(coordinator_name=None, coordinator_id=None):
     """
     Reserves the next continuous application number atomically and
     inserts a 'reserved' applications row so it is not available to others.
     Returns the application number string (e.g., PEC4880) and numeric part.
     """
     # We'll open a new sqlite connection here and use BEGIN IMMEDIATE to lock
-    conn = sqlite3.connect(DATABASE, timeout=10)
-    conn.row_factory = sqlite3.Row
+    conn = open_db()
     cur = conn.cursor()
     try:
         # Begin immediate transaction to acquire RESERVED lock (prevents concurrent writes)
@@ -83,9 +168,9 @@ def reserve_new_application_number(coordinator_name=None):
         # Ensure columns exist in init_db; but safe-guard here with try/except.
         try:
             cur.execute("""
-                INSERT INTO applications (application_number, numeric_part, coordinator, status, date_opened)
-                VALUES (?, ?, ?, 'reserved', ?)
-            """, (application_number, new_num, coordinator_name or '', now))
+                INSERT INTO applications (application_number, numeric_part, coordinator, coordinator_id, status, date_opened, last_modified)
+                VALUES (?, ?, ?, ?, 'reserved', ?, ?)
+            """, (application_number, new_num, coordinator_name or '', coordinator_id, now, now))
         except sqlite3.OperationalError:
             # If columns do not exist (older schema), try basic insert into legacy table (application_number only + names blank)
             # This ensures no crash; but init_db will upgrade schema on next run.
@@ -100,6 +185,7 @@ def reserve_new_application_number(coordinator_name=None):
                 raise
 
         conn.commit()
+        typeahead.add(new_num)
         return application_number, new_num
     except Exception as e:
         conn.rollback()
@@ -108,13 +194,14 @@ def reserve_new_application_number(coordinator_name=None):
         conn.close()
 
 
-def finalize_save_application(application_number, student_name, father_name, preferred_branch, form_data=None):
+def finalize_save_application(application_number, student_name, father_name, preferred_branch, form_data=None,
+                              coordinator_name=None, coordinator_id=None, mobile=None):
     """
     Finalize (save) the application: update reserved row to submitted and add fields.
     If reservation doesn't exist, create a new submitted row.
+    Returns a list of other applications that look like the same applicant.
     """
-    db = sqlite3.connect(DATABASE, timeout=10)
-    db.row_factory = sqlite3.Row
+    db = open_db()
     cur = db.cursor()
     try:
         cur.execute("BEGIN IMMEDIATE")
@@ -122,18 +209,23 @@ def finalize_save_application(application_number, student_name, father_name, pre
         cur.execute("SELECT id FROM applications WHERE application_number = ?", (application_number,))
         row = cur.fetchone()
         now = datetime.datetime.utcnow().isoformat(sep=' ', timespec='seconds')
+        fp, mobile_fp = dedupe.keys(student_name, father_name, mobile)
+        numeric_part = None
         if row:
             # update existing reserved row
             try:
                 cur.execute("""
                     UPDATE applications
-                    SET student_name=?, father_name=?, preferred_branch=?, status='submitted',
-                        form_data=?, date_submitted=?
+                    SET student_name=?, father_name=?, preferred_branch=?,
+                        mobile=COALESCE(?, mobile),
+                        status=CASE WHEN status IS NULL OR status = 'reserved' THEN 'submitted' ELSE status END,
+                        form_data=?, date_submitted=?, last_modified=?,
+                        fingerprint=?, mobile_fingerprint=mobile_fingerprint(?, COALESCE(?, mobile))
                     WHERE application_number=?
                 """, (
-                    student_name, father_name, preferred_branch,
+                    student_name, father_name, preferred_branch, mobile or None,
                     json.dumps(form_data) if form_data is not None else None,
-                    now, application_number
+                    now, now, fp, student_name, mobile or None, application_number
                 ))
             except sqlite3.OperationalError:
                 # fallback older schema: update only existing columns if present
@@ -144,24 +236,31 @@ def finalize_save_application(application_number, student_name, father_name, pre
                 """, (student_name, father_name, preferred_branch, application_number))
         else:
             # If not found (no reservation), create a new submitted row
-            numeric_part = None
             try:
                 numeric_part = int(application_number.replace('PEC',''))
             except:
                 numeric_part = None
             try:
                 cur.execute("""
-                    INSERT INTO applications (application_number, numeric_part, student_name, father_name, preferred_branch, status, form_data, date_opened, date_submitted)
-                    VALUES (?, ?, ?, ?, ?, 'submitted', ?, ?, ?)
-                """, (application_number, numeric_part, student_name, father_name, preferred_branch,
-                      json.dumps(form_data) if form_data is not None else None, now, now))
+                    INSERT INTO applications (application_number, numeric_part, coordinator, coordinator_id, student_name, father_name, preferred_branch, mobile, status, form_data, date_opened, date_submitted, fingerprint, mobile_fingerprint, last_modified)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'submitted', ?, ?, ?, ?, ?, ?)
+                """, (application_number, numeric_part, coordinator_name or '', coordinator_id,
+                      student_name, father_name, preferred_branch, mobile or None,
+                      json.dumps(form_data) if form_data is not None else None, now, now, fp, mobile_fp, now))
             except sqlite3.OperationalError:
                 # fallback minimal insert
                 cur.execute("""
                     INSERT INTO applications (application_number, student_name, father_name, preferred_branch)
                     VALUES (?, ?, ?, ?)
                 """, (application_number, student_name, father_name, preferred_branch))
+        if row:
+            # A stored mobile counts even when this save did not send one
+            cur.execute("SELECT mobile_fingerprint FROM applications WHERE application_number = ?", (application_number,))
+            mobile_fp = cur.fetchone()[0]
+        duplicates = dedupe.find_duplicates(cur, fp, mobile_fp, application_number)
         db.commit()
+        typeahead.add(numeric_part)
+        return duplicates
     except Exception as e:
         db.rollback()
         raise
@@ -206,19 +305,21 @@ def admin_login():
 def admin_dashboard():
     if 'admin_id' in session:
         db = get_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT work FROM admins WHERE id=?", (session['admin_id'],))
-        row = cursor.fetchone()
-        admin_work = row[0] if row else ""
+        profile = profiles.get_profile(db, 'admins', session['admin_id'])
+        admin_work = profile['work'] if profile else ""
 
-        # Fetch all coordinators
-        cursor.execute("SELECT first_name, last_name, email, phone, work FROM coordinators")
-        coordinators = cursor.fetchall() or []
+        # One page of coordinators with their application counts
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = app.config["ADMIN_COORDINATORS_PER_PAGE"]
+        coordinators, total = profiles.coordinator_page(db, page, per_page)
 
         return render_template(
             'admin_dashboard.html',
             work=admin_work,
             coordinators=coordinators,
+            page=page,
+            pages=max((total + per_page - 1) // per_page, 1),
+            total_coordinators=total,
             admin_name=session.get('admin_name')
         )
     return redirect(url_for('admin_page'))
@@ -232,6 +333,7 @@ def save_admin_work():
         cursor = db.cursor()
         cursor.execute("UPDATE admins SET work=? WHERE id=?", (work, session['admin_id']))
         db.commit()
+        profiles.invalidate('admins', session['admin_id'])
     return redirect(url_for('admin_dashboard'))
 
 
@@ -289,23 +391,10 @@ def coordinator_dashboard():
     if 'coordinator_id' not in session:
         return redirect(url_for('coordinator_page'))
 
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("""
-        SELECT first_name, last_name, email, phone, work
-        FROM coordinators WHERE id=?
-    """, (session['coordinator_id'],))
-    row = cursor.fetchone()
+    profile = profiles.get_profile(get_db(), 'coordinators', session['coordinator_id'])
 
-    if row:
-        coordinator_data = {
-            "first_name": row[0],
-            "last_name": row[1],
-            "email": row[2],
-            "phone": row[3],
-            "work": row[4],
-            "photo": None
-        }
+    if profile:
+        coordinator_data = dict(profile, photo=None)
     else:
         coordinator_data = {
             "first_name": "",
@@ -322,6 +411,7 @@ def coordinator_dashboard():
     )
 # ...existing code...
 @app.route('/get_coordinator_applications')
+@admission.limit('search')
 def get_coordinator_applications():
     """
     Return JSON list of applications for the logged-in coordinator.
@@ -329,40 +419,10 @@ def get_coordinator_applications():
     if 'coordinator_id' not in session:
         return jsonify({"applications": []}), 200
 
-    db = get_db()
-    cur = db.cursor()
-    try:
-        cur.execute("""
-            SELECT application_number, student_name, father_name, preferred_branch,
-                   mobile, address, status, date_submitted, form_data
-            FROM applications
-            WHERE coordinator = ?
-            ORDER BY id DESC
-        """, (session.get('coordinator_name', ''),))
-        rows = cur.fetchall()
-        apps = []
-        for r in rows:
-            rd = dict(r)
-            # parse form_data JSON if present
-            form_json = None
-            if rd.get('form_data'):
-                try:
-                    form_json = json.loads(rd['form_data'])
-                except Exception:
-                    form_json = None
-            apps.append({
-                "application_number": rd.get('application_number') or "",
-                "student_name": rd.get('student_name') or (form_json.get('student_name') if form_json else "") ,
-                "father_name": rd.get('father_name') or (form_json.get('father_name') if form_json else ""),
-                "preferred_branch": rd.get('preferred_branch') or (form_json.get('preferred_branch') if form_json else ""),
-                "mobile": rd.get('mobile') or (form_json.get('mobile') if form_json else ""),
-                "address": rd.get('address') or (form_json.get('address') if form_json else ""),
-                "status": rd.get('status'),
-                "date_submitted": rd.get('date_submitted')
-            })
-        return jsonify({"applications": apps}), 200
-    except Exception as e:
-        return jsonify({"error": str(e), "applications": []}), 500
+    # Streamed: the list is encoded batch by batch as rows come off the cursor
+    records = streamed_records(repository.for_coordinator, session['coordinator_id'])
+    return responses.stream_json_object("applications", records, repository.to_list_item,
+                                        app.json.dumps_bytes)
 # ...existing code...
 
 
@@ -374,6 +434,7 @@ def save_coordinator_work():
         cursor = db.cursor()
         cursor.execute("UPDATE coordinators SET work=? WHERE id=?", (work, session['coordinator_id']))
         db.commit()
+        profiles.invalidate('coordinators', session['coordinator_id'])
     return redirect(url_for('coordinator_dashboard'))
 
 
@@ -381,110 +442,92 @@ def save_coordinator_work():
 # Add this route after your existing routes
 # ...existing code...
 @app.route('/save_application', methods=['POST'])
+@admission.limit('writes')
 def save_application():
+    """
+    Submit an application in one UPSERT keyed on application_number.
+    With an Idempotency-Key header, retries of the same request replay the
+    first response instead of writing again.
+    """
     if 'coordinator_id' not in session:
         return jsonify({"error": "Not authorized"}), 401
 
     data = request.get_json()
+    appnum = (data or {}).get('application_number')
+    if not appnum:
+        return jsonify({"error": "application_number required"}), 400
+    key = request.headers.get(idempotency.HEADER)
+    if key is not None and not 0 < len(key) <= idempotency.MAX_KEY_LENGTH:
+        return jsonify({"error": f"{idempotency.HEADER} must be 1-{idempotency.MAX_KEY_LENGTH} characters"}), 400
+
     db = get_db()
     cursor = db.cursor()
-
+    fp, mobile_fp = dedupe.keys(data.get('student_name'), data.get('father_name'), data.get('mobile'))
     try:
-        # Check if application exists
-        cursor.execute("""
-            SELECT id FROM applications 
-            WHERE application_number = ?
-        """, (data['application_number'],))
-        exists = cursor.fetchone()
+        numeric_part = int(appnum.replace('PEC', ''))
+    except ValueError:
+        numeric_part = None
 
-        if exists:
-            # Try update with full schema
-            try:
-                cursor.execute("""
-                    UPDATE applications 
-                    SET student_name = ?,
-                        father_name = ?,
-                        preferred_branch = ?,
-                        mobile = ?,
-                        address = ?,
-                        status = 'submitted',
-                        last_modified = CURRENT_TIMESTAMP
-                    WHERE application_number = ?
-                """, (
-                    data.get('student_name'),
-                    data.get('father_name'),
-                    data.get('preferred_branch'),
-                    data.get('mobile'),
-                    data.get('address'),
-                    data['application_number']
-                ))
-            except sqlite3.OperationalError:
-                # Fallback update for older schema without mobile/address columns
-                cursor.execute("""
-                    UPDATE applications 
-                    SET student_name = ?,
-                        father_name = ?,
-                        preferred_branch = ?,
-                        status = 'submitted',
-                        last_modified = CURRENT_TIMESTAMP
-                    WHERE application_number = ?
-                """, (
-                    data.get('student_name'),
-                    data.get('father_name'),
-                    data.get('preferred_branch'),
-                    data['application_number']
-                ))
-        else:
-            # Try insert with full schema
-            try:
-                cursor.execute("""
-                    INSERT INTO applications (
-                        application_number,
-                        student_name,
-                        father_name,
-                        preferred_branch,
-                        mobile,
-                        address,
-                        status,
-                        coordinator,
-                        date_submitted
-                    ) VALUES (?, ?, ?, ?, ?, ?, 'submitted', ?, CURRENT_TIMESTAMP)
-                """, (
-                    data.get('application_number'),
-                    data.get('student_name'),
-                    data.get('father_name'),
-                    data.get('preferred_branch'),
-                    data.get('mobile'),
-                    data.get('address'),
-                    session.get('coordinator_name', '')
-                ))
-            except sqlite3.OperationalError:
-                # Fallback insert for older schema without mobile/address/date_submitted columns
-                cursor.execute("""
-                    INSERT INTO applications (
-                        application_number,
-                        student_name,
-                        father_name,
-                        preferred_branch,
-                        status,
-                        coordinator
-                    ) VALUES (?, ?, ?, ?, 'submitted', ?)
-                """, (
-                    data.get('application_number'),
-                    data.get('student_name'),
-                    data.get('father_name'),
-                    data.get('preferred_branch'),
-                    session.get('coordinator_name', '')
-                ))
+    try:
+        # Serializes concurrent retries so the key check below is reliable
+        cursor.execute("BEGIN IMMEDIATE")
+        if key is not None:
+            req_hash = idempotency.request_hash(data)
+            stored = idempotency.lookup(cursor, session['coordinator_id'], key)
+            if stored is not None:
+                db.rollback()
+                if stored[0] != req_hash:
+                    return jsonify({"error": f"{idempotency.HEADER} was already used for a different request"}), 422
+                response = app.response_class(stored[2], status=stored[1], mimetype="application/json")
+                response.headers[idempotency.REPLAY_HEADER] = "true"
+                return response
 
+        cursor.execute("""
+            INSERT INTO applications (
+                application_number, numeric_part, student_name, father_name, preferred_branch,
+                mobile, address, status, coordinator, coordinator_id, fingerprint, mobile_fingerprint,
+                date_submitted, last_modified
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, 'submitted', ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            ON CONFLICT (application_number) DO UPDATE SET
+                student_name = excluded.student_name,
+                father_name = excluded.father_name,
+                preferred_branch = excluded.preferred_branch,
+                mobile = excluded.mobile,
+                address = excluded.address,
+                -- Re-saving must not move a verified/allotted application back
+                status = CASE WHEN applications.status IS NULL OR applications.status = 'reserved' THEN 'submitted' ELSE applications.status END,
+                fingerprint = excluded.fingerprint,
+                mobile_fingerprint = excluded.mobile_fingerprint,
+                date_submitted = COALESCE(applications.date_submitted, excluded.date_submitted),
+                last_modified = CURRENT_TIMESTAMP
+        """, (
+            appnum,
+            numeric_part,
+            data.get('student_name'),
+            data.get('father_name'),
+            data.get('preferred_branch'),
+            data.get('mobile'),
+            data.get('address'),
+            session.get('coordinator_name', ''),
+            session['coordinator_id'],
+            fp,
+            mobile_fp
+        ))
+
+        duplicates = dedupe.find_duplicates(cursor, fp, mobile_fp, appnum)
+        body = app.json.dumps({"success": True, "possible_duplicates": duplicates})
+        if key is not None:
+            idempotency.store(cursor, session['coordinator_id'], key, req_hash, 200, body)
         db.commit()
-        return jsonify({"success": True}), 200
+        typeahead.add(numeric_part)
+        return app.response_class(body, status=200, mimetype="application/json")
 
     except Exception as e:
         db.rollback()
         return jsonify({"error": str(e)}), 500
 # ...existing code...
 @app.route('/application_form', methods=['GET', 'POST'])
+@admission.limit('writes')
 def application_form():
     if 'coordinator_id' not in session:
         flash("Please log in as coordinator to access the form", "error")
@@ -499,6 +542,7 @@ def application_form():
         student_name = request.form.get('student_name', '').strip()
         father_name = request.form.get('father_name', '').strip()
         preferred_branch = request.form.get('preferred_branch', '').strip()
+        mobile = request.form.get('mobile', '').strip()
 
         if not app_number:
             flash("No application number found. Please reopen the form.", "error")
@@ -516,19 +560,26 @@ def application_form():
         }
 
         try:
-            finalize_save_application(app_number, student_name, father_name, preferred_branch, form_data=form_data)
+            duplicates = finalize_save_application(app_number, student_name, father_name, preferred_branch, form_data=form_data,
+                                                   coordinator_name=session.get('coordinator_name', ''),
+                                                   coordinator_id=session['coordinator_id'],
+                                                   mobile=mobile)
         except Exception as e:
             flash(f"Error saving application: {e}", "error")
             return redirect(url_for('application_form'))
 
         flash(f"Application saved successfully! Application No: {app_number}", "success")
+        if duplicates:
+            others = ", ".join(d['application_number'] for d in duplicates)
+            flash(f"Possible duplicate applicant: {others}", "warning")
         return render_template('form.html', app_number=app_number, student_name=student_name,
                                father_name=father_name, preferred_branch=preferred_branch)
 
     # GET: when opening the form, reserve a new application number and show it on form
     try:
         coordinator_name = session.get('coordinator_name', '')
-        app_number, numeric_part = reserve_new_application_number(coordinator_name=coordinator_name)
+        app_number, numeric_part = reserve_new_application_number(coordinator_name=coordinator_name,
+                                                                   coordinator_id=session['coordinator_id'])
         # Render form with reserved number displayed and set into hidden field
         return render_template('form.html', app_number=app_number)
     except Exception as e:
@@ -539,6 +590,7 @@ def application_form():
 
 
 @app.route('/delete_reserved_application', methods=['POST'])
+@admission.limit('writes')
 def delete_reserved_application():
     data = request.get_json()
     appnum = data.get('application_number')
@@ -549,8 +601,11 @@ def delete_reserved_application():
     cur = db.cursor()
     try:
         # Delete only if status is 'reserved'
-        cur.execute("DELETE FROM applications WHERE application_number=? AND status='reserved'", (appnum,))
+        cur.execute("DELETE FROM applications WHERE application_number=? AND status='reserved' RETURNING numeric_part", (appnum,))
+        deleted = cur.fetchall()
         db.commit()
+        for row in deleted:
+            typeahead.remove(row['numeric_part'])
         return jsonify({"success": True, "message": "Reserved application deleted"}), 200
     except Exception as e:
         db.rollback()
@@ -562,6 +617,7 @@ def delete_reserved_application():
 # ---------------- Search, Edit, Delete APIs ----------------
 
 @app.route('/search_application', methods=['GET'])
+@admission.limit('search')
 def search_application():
     """
     Search by application_number (query param: application_number) and return JSON.
@@ -570,29 +626,44 @@ def search_application():
     if not appnum:
         return jsonify({"success": False, "error": "application_number query param required"}), 400
 
-    db = get_db()
-    cur = db.cursor()
-    cur.execute("""
-        SELECT id, application_number, numeric_part, coordinator, status,
-               student_name, father_name, preferred_branch,
-               form_data, date_opened, date_submitted, last_modified
-        FROM applications WHERE application_number = ?
-    """, (appnum,))
-    row = cur.fetchone()
-    if not row:
+    record = repository.get_by_number(get_db(), appnum)
+    if record is None:
         return jsonify({"success": True, "found": False, "data": None}), 200
 
-    data = dict(row)
-    # Parse form_data JSON if present
-    if data.get('form_data'):
-        try:
-            data['form_data'] = json.loads(data['form_data'])
-        except Exception:
-            pass
+    data = repository.to_dict(record, repository.DETAIL)
     return jsonify({"success": True, "found": True, "data": data}), 200
 
 
+@app.route('/application_typeahead', methods=['GET'])
+@admission.limit('search')
+def application_typeahead():
+    """
+    Admin-wide prefix lookup on application numbers (query params: q, e.g.
+    "PEC48" or "48", and optional limit). Returns the lowest matching numbers.
+    """
+    if 'admin_id' not in session:
+        return jsonify({"error": "Not authorized"}), 401
+
+    q = request.args.get('q', '')
+    digits = typeahead.parse_prefix(q)
+    if digits is None:
+        return jsonify({"query": q, "matches": []}), 200
+    limit = min(max(request.args.get('limit', typeahead.DEFAULT_LIMIT, type=int), 1), typeahead.MAX_LIMIT)
+
+    db = get_db()
+    if app.config["TYPEAHEAD_IN_MEMORY"]:
+        records = repository.with_numeric_parts(db, typeahead.search(db, digits, limit))
+    else:
+        cur = db.cursor()
+        cur.execute("SELECT MAX(numeric_part) FROM applications")
+        max_value = cur.fetchone()[0] or 0
+        records = repository.with_number_prefix(db, typeahead.prefix_ranges(digits, max_value), limit)
+    matches = [repository.to_dict(r, repository.TYPEAHEAD) for r in itertools.islice(records, limit)]
+    return jsonify({"query": q, "matches": matches}), 200
+
+
 @app.route('/edit_application', methods=['POST'])
+@admission.limit('writes')
 def edit_application():
     """
     Edit an application. Expects JSON or form data including application_number and fields to update.
@@ -629,6 +700,13 @@ def edit_application():
     cur = db.cursor()
     try:
         cur.execute(f"UPDATE applications SET {set_clause}, last_modified = ? WHERE application_number = ?", (*list(fields.values()), datetime.datetime.utcnow().isoformat(sep=' ', timespec='seconds'), appnum))
+        if 'student_name' in fields or 'father_name' in fields:
+            cur.execute("""
+                UPDATE applications
+                SET fingerprint = fingerprint(student_name, father_name),
+                    mobile_fingerprint = mobile_fingerprint(student_name, mobile)
+                WHERE application_number = ?
+            """, (appnum,))
         db.commit()
         return jsonify({"success": True, "message": "Updated"}), 200
     except Exception as e:
@@ -637,6 +715,7 @@ def edit_application():
 
 
 @app.route('/delete_application', methods=['POST'])
+@admission.limit('writes')
 def delete_application():
     """
     Delete an application. Expects form param or json: application_number
@@ -649,8 +728,11 @@ def delete_application():
     db = get_db()
     cur = db.cursor()
     try:
-        cur.execute("DELETE FROM applications WHERE application_number = ?", (appnum,))
+        cur.execute("DELETE FROM applications WHERE application_number = ? RETURNING numeric_part", (appnum,))
+        deleted = cur.fetchall()
         db.commit()
+        for row in deleted:
+            typeahead.remove(row['numeric_part'])
         return jsonify({"success": True, "message": "Deleted"}), 200
     except Exception as e:
         db.rollback()
@@ -671,6 +753,7 @@ def get_date_column(table_name):
     return None
 
 @app.route("/check_data")
+@admission.limit('search')
 def check_data():
     start = request.args.get("start_date")
     end = request.args.get("end_date")
@@ -699,165 +782,213 @@ def check_data():
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/download_excel', methods=['GET'])
-def download_excel():
+@app.route('/download/<fmt>', methods=['GET'])
+@admission.limit('exports')
+def download_export(fmt):
+    """
+    Download applications submitted between start_date and end_date in any
+    registered export format (xlsx, pdf, csv).
+    """
+    backend = exports.get_backend(fmt)
+    if backend is None:
+        return f"Unsupported export format: {fmt}", 404
+
     start = request.args.get('start_date')
     end = request.args.get('end_date')
-    chart = request.args.get('chart', '0')
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("SELECT * FROM applications WHERE date_submitted BETWEEN ? AND ?",
-                (start + " 00:00:00", end + " 23:59:59"))
-    rows = cur.fetchall()
+    if not start or not end:
+        return "Start and end dates required", 400
 
-    if not rows:
+    rows = repository.submitted_between(get_db(), start, end)
+    first = next(rows, None)
+    if first is None:
         return "No data found for the selected dates.", 404
+    rows = itertools.chain([first], rows)
 
-    import openpyxl
-    from io import BytesIO
-    from openpyxl.chart import PieChart, Reference
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Applications"
-
-    headers = ["Application No", "Student Name", "Father Name", "Mobile", "Address", "Department", "Form Data", "Date Submitted"]
-    ws.append(headers)
-
-    dept_count = {}
-    for r in rows:
-        rdict = dict(r)
-        form_json = rdict.get('form_data') or ''
-        ws.append([
-            rdict.get('application_number'),
-            rdict.get('student_name'),
-            rdict.get('father_name'),
-            rdict.get('mobile'),
-            rdict.get('address'),
-            rdict.get('preferred_branch'),
-            form_json,
-            rdict.get('date_submitted')
-        ])
-        dept = rdict.get('preferred_branch')
-        if dept:
-            dept_count[dept] = dept_count.get(dept, 0) + 1
-
-    if chart == '1' and dept_count:
-        ws_chart = wb.create_sheet(title="Department Pie Chart")
-        ws_chart.append(["Department", "Count"])
-        for dept, count in dept_count.items():
-            ws_chart.append([dept, count])
-        pie = PieChart()
-        data = Reference(ws_chart, min_col=2, min_row=1, max_row=len(dept_count)+1)
-        labels = Reference(ws_chart, min_col=1, min_row=2, max_row=len(dept_count)+1)
-        pie.add_data(data, titles_from_data=True)
-        pie.set_categories(labels)
-        pie.title = "Students by Department"
-        ws_chart.add_chart(pie, "E5")
-
-    buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    from flask import send_file
-    return send_file(buf, as_attachment=True, download_name=f"applications_{start}_{end}.xlsx",
-                     mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    options = {}
+    if fmt == 'xlsx':
+        options['chart'] = request.args.get('chart', '0') == '1'
+    elif fmt == 'pdf':
+        options['title'] = f"Applications {start} to {end}"
+        options['workers'] = app.config["PDF_RENDER_WORKERS"]
 
-@app.route('/download_pdf', methods=['GET'])
-def download_pdf():
-    start = request.args.get('start_date')
-    end = request.args.get('end_date')
-    db = get_db()
-    cur = db.cursor()
+    buf = tempfile.SpooledTemporaryFile(max_size=app.config["EXPORT_SPOOL_MAX_BYTES"])
+    exports.export_rows(fmt, rows, buf=buf, **options)
+    return send_file(buf, as_attachment=True,
+                     download_name=f"applications_{start}_{end}.{backend['extension']}",
+                     mimetype=backend['mimetype'])
 
-    cur.execute("SELECT * FROM applications WHERE date_submitted BETWEEN ? AND ?",
-                (start + " 00:00:00", end + " 23:59:59"))
-    rows = cur.fetchall()
 
-    if not rows:
-        return "No data found for the selected dates.", 404
+@app.route('/export/<fmt>', methods=['GET'])
+@admission.limit('exports')
+def export_feed(fmt):
+    """
+    Stream applications as CSV or NDJSON for downstream systems, straight
+    from the cursor at constant memory.
+
+    Filters (all optional): start_date, end_date (on date_submitted),
+    status, branch, coordinator_id, since (last_modified at or after) and
+    since_seq for incremental pulls. Rows come ordered by change_seq, which
+    every insert/update advances; pass the last row's change_seq as
+    since_seq to fetch only later changes.
+    """
+    if fmt not in exports.STREAM_FORMATS:
+        return jsonify({"error": f"Unsupported export format: {fmt}"}), 404
+
+    token = app.config.get("EXPORT_API_TOKEN")
+    authorization = request.headers.get('Authorization', '').encode()
+    if 'admin_id' not in session and not (token and hmac.compare_digest(authorization, f"Bearer {token}".encode())):
+        return jsonify({"error": "Not authorized"}), 401
+
+    args = request.args
+    for name in ('coordinator_id', 'since_seq'):
+        # A malformed cursor must not silently turn into a full export
+        if args.get(name) is not None and not args[name].isdigit():
+            return jsonify({"error": f"{name} must be a non-negative integer"}), 400
+    filters = {
+        "start": args.get('start_date'),
+        "end": args.get('end_date'),
+        "status": args.get('status'),
+        "branch": args.get('branch'),
+        "coordinator_id": args.get('coordinator_id', type=int),
+        "since": args.get('since'),
+        "since_seq": args.get('since_seq', type=int),
+    }
+    records = streamed_records(repository.filtered, repository.SYNC, *filters.values())
+    if fmt == 'csv':
+        body = exports.iter_csv(records, repository.SYNC)
+    else:
+        body = exports.iter_ndjson(records, repository.SYNC, app.json.dumps_bytes)
+
+    resp = app.response_class(body, mimetype=exports.STREAM_FORMATS[fmt])
+    resp.headers['Content-Disposition'] = f"attachment; filename=applications.{fmt}"
+    return resp
+
+
+@app.route('/download_excel', methods=['GET'])
+def download_excel():
+    return download_export('xlsx')
+
+
+@app.route('/download_pdf', methods=['GET'])
+def download_pdf():
+    return download_export('pdf')
 
-    from io import BytesIO
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
-
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    x_margin = 40
-    y = height - 50
-    line_height = 14
-
-    headers = ["App No", "Student", "Father", "Mobile", "Address", "Dept", "Date Submitted"]
-    p.setFont("Helvetica-Bold", 9)
-    x_positions = [x_margin + i*70 for i in range(len(headers))]
-    for i, h in enumerate(headers):
-        p.drawString(x_positions[i], y, h)
-    y -= line_height
-    p.setFont("Helvetica", 9)
-
-    for r in rows:
-        rdict = dict(r)
-        rowvals = [
-            rdict.get('application_number') or '',
-            rdict.get('student_name') or '',
-            rdict.get('father_name') or '',
-            rdict.get('mobile') or '',
-            rdict.get('address') or '',
-            rdict.get('preferred_branch') or '',
-            rdict.get('date_submitted') or ''
-        ]
-        for i, val in enumerate(rowvals):
-            p.drawString(x_positions[i], y, str(val)[:12])
-        y -= line_height
-        if y < 60:
-            p.showPage()
-            y = height - 50
-            p.setFont("Helvetica-Bold", 9)
-            for i, h in enumerate(headers):
-                p.drawString(x_positions[i], y, h)
-            y -= line_height
-            p.setFont("Helvetica", 9)
-
-    p.save()
-    buffer.seek(0)
-    from flask import send_file
-    return send_file(buffer, as_attachment=True, download_name=f"applications_{start}_{end}.pdf", mimetype="application/pdf")
 
 @app.route('/search_students')
+@admission.limit('search')
 def search_students():
     if 'coordinator_id' not in session:
         return jsonify({"error": "Not authorized"}), 401
         
-    search_term = request.args.get('term', '').lower()
-    
+    search_term = request.args.get('term', '')
+
+    def to_student(a):
+        item = repository.to_dict(a, repository.SEARCH)
+        # Follow-up visits are not stored yet; the dashboard shows '-'
+        item['next_visit'] = None
+        return item
+
+    records = streamed_records(repository.search_for_coordinator, session['coordinator_id'], search_term)
+    return responses.stream_json_object("students", records, to_student, app.json.dumps_bytes)
+
+
+@app.route('/duplicate_report')
+@admission.limit('search')
+def duplicate_report():
+    """
+    Admin report of applications that share a duplicate fingerprint.
+    """
+    if 'admin_id' not in session:
+        return jsonify({"error": "Not authorized"}), 401
+
+    cur = get_db().cursor()
+    clusters = dedupe.duplicate_clusters(cur)
+    return jsonify({"clusters": clusters, "count": len(clusters)}), 200
+
+
+@app.route('/application_status', methods=['POST'])
+@admission.limit('writes')
+def application_status():
+    """
+    Move an application along the status lifecycle (JSON or form:
+    application_number, status). Admin only.
+    """
+    if 'admin_id' not in session:
+        return jsonify({"error": "Not authorized"}), 401
+
+    data = request.get_json(silent=True) or request.form
+    appnum = data.get('application_number')
+    status = data.get('status')
+    if not appnum or not status:
+        return jsonify({"success": False, "error": "application_number and status required"}), 400
+
+    now = datetime.datetime.utcnow().isoformat(sep=' ', timespec='seconds')
     try:
-        db = get_db()
-        cursor = db.cursor()
-        
-        cursor.execute("""
-            SELECT * FROM applications 
-            WHERE (LOWER(student_name) LIKE ? OR 
-                  LOWER(application_number) LIKE ?) AND
-                  coordinator = ?
-        """, (f'%{search_term}%', f'%{search_term}%', session.get('coordinator_name', '')))
-        
-        students = []
-        for row in cursor.fetchall():
-            students.append({
-                'application_number': row['application_number'],
-                'student_name': row['student_name'],
-                'father_name': row['father_name'],
-                'preferred_branch': row['preferred_branch'],
-                'mobile': row['mobile'],
-                'address': row['address'],
-                'next_visit': row.get('next_visit')
-            })
-            
-        return jsonify({"students": students}), 200
-        
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        previous = lifecycle.transition(get_db(), appnum, status, now)
+    except LookupError:
+        return jsonify({"success": False, "error": "Application not found"}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e),
+                        "allowed": lifecycle.allowed_transitions(get_db().cursor())}), 409
+    return jsonify({"success": True, "from": previous, "to": status}), 200
+
+
+@app.route('/status_funnel')
+@admission.limit('search')
+def status_funnel():
+    """
+    Per-stage application counts and time-in-stage percentiles (seconds).
+    """
+    if 'admin_id' not in session:
+        return jsonify({"error": "Not authorized"}), 401
+
+    db = get_db()
+    return jsonify({
+        "stages": lifecycle.funnel(db),
+        "transitions": lifecycle.allowed_transitions(db.cursor()),
+    }), 200
+
+
+@app.route('/status_history')
+@admission.limit('search')
+def status_history():
+    """
+    Status changes of one application (query param: application_number).
+    """
+    if 'admin_id' not in session:
+        return jsonify({"error": "Not authorized"}), 401
+
+    record = repository.get_by_number(get_db(), request.args.get('application_number', '').strip(), ("id", "status"))
+    if record is None:
+        return jsonify({"success": False, "error": "Application not found"}), 404
+    return jsonify({"success": True, "status": record.status,
+                    "history": lifecycle.history(get_db(), record.id)}), 200
+
+
+@app.route('/admin/maintenance', methods=['GET', 'POST'])
+def admin_maintenance():
+    """
+    GET: recent maintenance runs with timings.
+    POST (task=...): run a maintenance task now and return its report.
+    """
+    if 'admin_id' not in session:
+        return jsonify({"error": "Not authorized"}), 401
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        task = data.get('task')
+        if task not in maintenance.TASKS:
+            return jsonify({"success": False, "error": f"task must be one of {', '.join(maintenance.TASKS)}"}), 400
+        report = maintenance.run(open_db, task, app.config)
+        return jsonify({"success": report["ok"], "report": report}), 200
+
+    return jsonify({"runs": maintenance.recent_runs(get_db())}), 200
+
+
+@app.before_request
+def start_maintenance_scheduler():
+    if app.config["MAINTENANCE_SCHEDULER"] and not app.testing:
+        maintenance.start_scheduler(open_db, app.config, app.logger)
 
 
 # ---------------- Logout ----------------
@@ -868,102 +999,478 @@ def logout():
 
 
 # ---------------- Database Setup ----------------
+# Bump SCHEMA_VERSION and append to MIGRATIONS when the schema changes.
+# The applied version is stored in PRAGMA user_version.
+SCHEMA_VERSION = 8
+
+
+def migrate_v1(cursor):
+    """
+    Base schema: admins, coordinators, applications, application_sequence
+    and the default admin account.
+    """
+    # Admins
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS admins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT,
+            last_name TEXT,
+            email TEXT UNIQUE,
+            phone TEXT,
+            password TEXT,
+            work TEXT
+        )
+    """)
+
+    # Coordinators
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS coordinators (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT,
+            last_name TEXT,
+            email TEXT UNIQUE,
+            phone TEXT,
+            password TEXT,
+            work TEXT
+        )
+    """)
+
+    # Applications table with all needed columns
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS applications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            application_number TEXT,
+            numeric_part INTEGER,
+            coordinator TEXT,
+            status TEXT,
+            student_name TEXT,
+            father_name TEXT,
+            preferred_branch TEXT,
+            mobile TEXT,
+            address TEXT,
+            form_data TEXT,
+            date_opened TEXT,
+            date_submitted TEXT,
+            last_modified TEXT
+        )
+    """)
+
+    # Sequence table for continuous application numbers
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS application_sequence (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_number INTEGER NOT NULL
+        )
+    """)
+
+    # Add all possible missing columns (older databases)
+    add_column_if_not_exists(cursor, "applications", "numeric_part INTEGER")
+    add_column_if_not_exists(cursor, "applications", "coordinator TEXT")
+    add_column_if_not_exists(cursor, "applications", "status TEXT")
+    add_column_if_not_exists(cursor, "applications", "mobile TEXT")
+    add_column_if_not_exists(cursor, "applications", "address TEXT")
+    add_column_if_not_exists(cursor, "applications", "form_data TEXT")
+    add_column_if_not_exists(cursor, "applications", "date_opened TEXT")
+    add_column_if_not_exists(cursor, "applications", "date_submitted TEXT")
+    add_column_if_not_exists(cursor, "applications", "last_modified TEXT")
+
+    # Initialize sequence if empty
+    cursor.execute("SELECT COUNT(*) as cnt FROM application_sequence")
+    if cursor.fetchone()['cnt'] == 0:
+        cursor.execute("SELECT MAX(CAST(SUBSTR(application_number,4) AS INTEGER)) as mx FROM applications")
+        r = cursor.fetchone()
+        start = 4879
+        if r and r['mx'] is not None:
+            start = max(start, r['mx'])
+        cursor.execute("INSERT INTO application_sequence (id, last_number) VALUES (1, ?)", (start,))
+
+    # Default admin
+    cursor.execute("SELECT * FROM admins WHERE email=?", ("admin@example.com",))
+    if not cursor.fetchone():
+        cursor.execute("""
+            INSERT INTO admins (first_name, last_name, email, phone, password, work)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, ("Default", "Admin", "admin@example.com", "0000000000", "admin123", ""))
+
+
+def migrate_v2(cursor):
+    """
+    Duplicate-applicant keys (name and mobile, see dedupe.py), their
+    indexes and a backfill.
+    """
+    add_column_if_not_exists(cursor, "applications", "fingerprint TEXT")
+    add_column_if_not_exists(cursor, "applications", "mobile_fingerprint TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_applications_fingerprint ON applications (fingerprint, application_number)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_applications_mobile_fingerprint ON applications (mobile_fingerprint, application_number)")
+    cursor.execute("""
+        UPDATE applications
+        SET fingerprint = fingerprint(student_name, father_name),
+            mobile_fingerprint = mobile_fingerprint(student_name, mobile)
+    """)
+
+
+def migrate_v3(cursor):
+    """
+    Link applications to coordinators by integer id instead of the free-text
+    name, backfilling from the existing coordinator names. Names shared by
+    several coordinators cannot be attributed, so those applications keep
+    coordinator_id NULL and are reported for manual assignment.
+    """
+    add_column_if_not_exists(cursor, "applications", "coordinator_id INTEGER REFERENCES coordinators(id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_applications_coordinator_id ON applications (coordinator_id, id)")
+    cursor.execute("""
+        UPDATE applications
+        SET coordinator_id = (
+            SELECT CASE WHEN COUNT(*) = 1 THEN MIN(c.id) END FROM coordinators c
+            WHERE c.first_name || ' ' || c.last_name = applications.coordinator
+        )
+        WHERE coordinator_id IS NULL AND coordinator IS NOT NULL AND coordinator != ''
+    """)
+    cursor.execute("""
+        SELECT coordinator, COUNT(*) FROM applications
+        WHERE coordinator_id IS NULL AND coordinator IS NOT NULL AND coordinator != ''
+        GROUP BY coordinator
+    """)
+    for name, count in cursor.fetchall():
+        print(f"Could not assign {count} application(s) of coordinator '{name}': "
+              "name is ambiguous or unknown, set coordinator_id manually")
+
+
+def migrate_v4(cursor):
+    """
+    Change sequence for incremental /export pulls. last_modified has
+    one-second resolution, so it cannot order changes made in the same
+    second; instead every insert/update takes the next value of
+    change_counter into change_seq (triggers), and pulls resume from the
+    last change_seq seen. Rows written before last_modified was maintained
+    get their latest date, or the migration time when they have none.
+    """
+    cursor.execute("""
+        UPDATE applications
+        SET last_modified = COALESCE(date_submitted, date_opened, CURRENT_TIMESTAMP)
+        WHERE last_modified IS NULL
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_applications_last_modified ON applications (last_modified, id)")
+
+    add_column_if_not_exists(cursor, "applications", "change_seq INTEGER")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL
+        )
+    """)
+    # Existing rows are numbered in (last_modified, id) order
+    cursor.execute("""
+        CREATE TEMP TABLE change_order AS
+        SELECT id, ROW_NUMBER() OVER (ORDER BY last_modified, id) AS seq FROM applications
+    """)
+    cursor.execute("""
+        UPDATE applications
+        SET change_seq = (SELECT seq FROM change_order WHERE change_order.id = applications.id)
+    """)
+    cursor.execute("DROP TABLE change_order")
+    cursor.execute("""
+        INSERT OR REPLACE INTO change_counter (id, value)
+        SELECT 1, COALESCE(MAX(change_seq), 0) FROM applications
+    """)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_applications_change_seq ON applications (change_seq)")
+
+    bump = """
+        UPDATE change_counter SET value = value + 1 WHERE id = 1;
+        UPDATE applications SET change_seq = (SELECT value FROM change_counter WHERE id = 1) WHERE id = NEW.id;
+    """
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS applications_change_seq_insert
+        AFTER INSERT ON applications
+        BEGIN {bump} END
+    """)
+    # The WHEN clause skips the trigger's own change_seq update
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS applications_change_seq_update
+        AFTER UPDATE ON applications WHEN NEW.change_seq IS OLD.change_seq
+        BEGIN {bump} END
+    """)
+
+
+def migrate_v5(cursor):
+    """
+    Log of maintenance runs; also used to claim a task across processes.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            duration_ms REAL,
+            ok INTEGER,
+            result TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_runs_task ON maintenance_runs (task, started_at)")
+
+
+def migrate_v6(cursor):
+    """
+    Index numeric_part for application-number prefix lookups, filling it in
+    for rows created by the legacy insert paths.
+    """
+    cursor.execute("""
+        UPDATE applications
+        SET numeric_part = CAST(SUBSTR(application_number, 4) AS INTEGER)
+        WHERE numeric_part IS NULL AND application_number GLOB 'PEC[0-9]*'
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_applications_numeric_part ON applications (numeric_part)")
+
+
+def migrate_v7(cursor):
+    """
+    Make application_number unique (the target of the save UPSERT) and add
+    the idempotency key store. Existing duplicate numbers are resolved
+    first: duplicate reservations are dropped, and any other extra copies
+    keep their data under "<number>-dup<id>" for review.
+    """
+    # One row per duplicated number survives: a non-reserved row if any, newest first
+    cursor.execute("""
+        CREATE TEMP TABLE duplicate_losers AS
+        SELECT id, status FROM (
+            SELECT id, status, ROW_NUMBER() OVER (
+                PARTITION BY application_number
+                ORDER BY status = 'reserved', id DESC
+            ) AS rn
+            FROM applications
+            WHERE application_number IS NOT NULL
+        ) WHERE rn > 1
+    """)
+    cursor.execute("""
+        DELETE FROM applications
+        WHERE id IN (SELECT id FROM duplicate_losers WHERE status = 'reserved')
+    """)
+    cursor.execute("""
+        UPDATE applications
+        SET application_number = application_number || '-dup' || id
+        WHERE id IN (SELECT id FROM duplicate_losers WHERE status IS NOT 'reserved')
+    """)
+    cursor.execute("DROP TABLE duplicate_losers")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_applications_number ON applications (application_number)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            owner_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            request_hash TEXT NOT NULL,
+            status_code INTEGER NOT NULL,
+            response TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (owner_id, key)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys (created_at)")
+
+
+def migrate_v8(cursor):
+    """
+    Status lifecycle: allowed transitions, append-only status_history and
+    precomputed status_counts, both maintained by triggers so every status
+    change is recorded in its own transaction (see lifecycle.py). Existing
+    applications get one history row for their current status.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS status_transitions (
+            from_status TEXT NOT NULL,
+            to_status TEXT NOT NULL,
+            PRIMARY KEY (from_status, to_status)
+        )
+    """)
+    cursor.executemany("INSERT OR IGNORE INTO status_transitions (from_status, to_status) VALUES (?, ?)",
+                       lifecycle.TRANSITIONS)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS status_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            application_id INTEGER NOT NULL,
+            from_status TEXT,
+            to_status TEXT,
+            changed_at TEXT NOT NULL,
+            seconds_in_stage REAL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_status_history_application ON status_history (application_id, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_status_history_stage_time ON status_history (from_status, seconds_in_stage)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_status_history_to_status ON status_history (to_status, changed_at)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS status_counts (
+            status TEXT PRIMARY KEY NOT NULL,
+            count INTEGER NOT NULL
+        )
+    """)
+
+    # Backfill before the triggers exist
+    cursor.execute("""
+        INSERT INTO status_history (application_id, from_status, to_status, changed_at)
+        SELECT id, NULL, status, COALESCE(date_submitted, date_opened, last_modified, CURRENT_TIMESTAMP)
+        FROM applications WHERE status IS NOT NULL ORDER BY id
+    """)
+    cursor.execute("""
+        INSERT OR REPLACE INTO status_counts (status, count)
+        SELECT status, COUNT(*) FROM applications WHERE status IS NOT NULL GROUP BY status
+    """)
+    cursor.executemany("INSERT OR IGNORE INTO status_counts (status, count) VALUES (?, 0)",
+                       [(stage,) for stage in lifecycle.STAGES])
+
+    # Time since the application entered its current status
+    since_entered = """
+        (julianday(CURRENT_TIMESTAMP) - julianday(COALESCE(
+            (SELECT changed_at FROM status_history WHERE application_id = OLD.id ORDER BY id DESC LIMIT 1),
+            OLD.date_opened))) * 86400
+    """
+    # New statuses outside STAGES get a counter row. Not INSERT OR IGNORE:
+    # inside a trigger the outer statement's conflict policy replaces it, so
+    # the UPSERT in save_application would turn it into a plain INSERT.
+    add_counter = """
+        INSERT INTO status_counts (status, count) SELECT NEW.status, 0
+        WHERE NOT EXISTS (SELECT 1 FROM status_counts WHERE status = NEW.status)
+    """
+    # One execute() per trigger: executescript() would commit the migration midway
+    triggers = [
+        f"""
+            CREATE TRIGGER IF NOT EXISTS applications_status_insert
+            AFTER INSERT ON applications WHEN NEW.status IS NOT NULL
+            BEGIN
+                INSERT INTO status_history (application_id, from_status, to_status, changed_at)
+                VALUES (NEW.id, NULL, NEW.status, CURRENT_TIMESTAMP);
+                {add_counter};
+                UPDATE status_counts SET count = count + 1 WHERE status = NEW.status;
+            END;
+        """,
+        f"""
+            CREATE TRIGGER IF NOT EXISTS applications_status_update
+            AFTER UPDATE OF status ON applications WHEN OLD.status IS NOT NEW.status
+            BEGIN
+                INSERT INTO status_history (application_id, from_status, to_status, changed_at, seconds_in_stage)
+                VALUES (NEW.id, OLD.status, NEW.status, CURRENT_TIMESTAMP, {since_entered});
+                UPDATE status_counts SET count = count - 1 WHERE status = OLD.status;
+                {add_counter} AND NEW.status IS NOT NULL;
+                UPDATE status_counts SET count = count + 1 WHERE status = NEW.status;
+            END;
+        """,
+        f"""
+            CREATE TRIGGER IF NOT EXISTS applications_status_delete
+            AFTER DELETE ON applications WHEN OLD.status IS NOT NULL
+            BEGIN
+                INSERT INTO status_history (application_id, from_status, to_status, changed_at, seconds_in_stage)
+                VALUES (OLD.id, OLD.status, NULL, CURRENT_TIMESTAMP, {since_entered});
+                UPDATE status_counts SET count = count - 1 WHERE status = OLD.status;
+            END;
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS status_history_no_update
+            BEFORE UPDATE ON status_history
+            BEGIN
+                SELECT RAISE(ABORT, 'status_history is append-only');
+            END;
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS status_history_no_delete
+            BEFORE DELETE ON status_history
+            BEGIN
+                SELECT RAISE(ABORT, 'status_history is append-only');
+            END;
+        """,
+    ]
+    for trigger in triggers:
+        cursor.execute(trigger)
+
+
+MIGRATIONS = [migrate_v1, migrate_v2, migrate_v3, migrate_v4, migrate_v5, migrate_v6, migrate_v7, migrate_v8]
+
+
+def add_column_if_not_exists(cursor, table, column_def):
+    col_name = column_def.split()[0]
+    try:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_def}")
+        print(f"Added column {col_name} to {table}")  # Debug log
+    except sqlite3.OperationalError:
+        pass
+
+
 def init_db():
     """
     Initialize or upgrade the database schema safely.
+    Does nothing when the stored schema version is already current.
     """
     with sqlite3.connect(DATABASE, timeout=10) as db:
+        db.row_factory = sqlite3.Row
+        register_functions(db)
         cursor = db.cursor()
 
-        # Admins
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS admins (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                first_name TEXT,
-                last_name TEXT,
-                email TEXT UNIQUE,
-                phone TEXT,
-                password TEXT,
-                work TEXT
-            )
-        """)
-
-        # Coordinators
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS coordinators (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                first_name TEXT,
-                last_name TEXT,
-                email TEXT UNIQUE,
-                phone TEXT,
-                password TEXT,
-                work TEXT
-            )
-        """)
-
-        # Applications table with all needed columns
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS applications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                application_number TEXT,
-                numeric_part INTEGER,
-                coordinator TEXT,
-                status TEXT,
-                student_name TEXT,
-                father_name TEXT,
-                preferred_branch TEXT,
-                mobile TEXT,
-                address TEXT,
-                form_data TEXT,
-                date_opened TEXT,
-                date_submitted TEXT,
-                last_modified TEXT
-            )
-        """)
-
-        # Sequence table for continuous application numbers
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS application_sequence (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                last_number INTEGER NOT NULL
-            )
-        """)
-
-        # Initialize sequence if empty
-        cursor.execute("SELECT COUNT(*) as cnt FROM application_sequence")
-        if cursor.fetchone()['cnt'] == 0:
-            cursor.execute("SELECT MAX(CAST(SUBSTR(application_number,4) AS INTEGER)) as mx FROM applications")
-            r = cursor.fetchone()
-            start = 4879
-            if r and r['mx'] is not None:
-                start = max(start, r['mx'])
-            cursor.execute("INSERT INTO application_sequence (id, last_number) VALUES (1, ?)", (start,))
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            for migrate in MIGRATIONS[version:SCHEMA_VERSION]:
+                migrate(cursor)
 
-        # Add missing columns safely
-        def add_column_if_not_exists(table, column_def):
-            col_name = column_def.split()[0]
-            try:
-                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_def}")
-                print(f"Added column {col_name} to {table}")  # Debug log
-            except sqlite3.OperationalError:
-                pass
-
-        # Add all possible missing columns
-        add_column_if_not_exists("applications", "status TEXT")
-        add_column_if_not_exists("applications", "mobile TEXT")
-        add_column_if_not_exists("applications", "address TEXT")
-        add_column_if_not_exists("applications", "date_submitted TEXT")
-        add_column_if_not_exists("applications", "last_modified TEXT")
-
-        # Default admin
-        cursor.execute("SELECT * FROM admins WHERE email=?", ("admin@example.com",))
-        if not cursor.fetchone():
-            cursor.execute("""
-                INSERT INTO admins (first_name, last_name, email, phone, password, work)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, ("Default", "Admin", "admin@example.com", "0000000000", "admin123", ""))
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            db.commit()
 
-        db.commit()
+        # WAL, incremental auto-vacuum, page size (no-op once applied)
+        maintenance.configure_database(db, app.config)
+
+
+# ---------------- Maintenance CLI ----------------
+@app.cli.command("db-maintenance")
+@click.argument("tasks", nargs=-1)
+def db_maintenance(tasks):
+    """
+    Run SQLite maintenance tasks now (default: all) and print their timings.
+    """
+    for task in tasks or maintenance.TASKS:
+        if task not in maintenance.TASKS:
+            raise SystemExit(f"Unknown task {task}; choose from {', '.join(maintenance.TASKS)}")
+        report = maintenance.run(open_db, task, app.config)
+        print(f"{task}: {report['result']} ({report['duration_ms']} ms)")
+
+
+# ---------------- Startup budget ----------------
+def measure_startup():
+    """
+    Import the app in a fresh interpreter. Returns (import seconds, peak RSS
+    in MB, export libraries that were imported eagerly).
+    """
+    import os, subprocess, sys
+    probe = (
+        "import sys, time, resource\n"
+        "t = time.perf_counter()\n"
+        "import app\n"
+        "elapsed = time.perf_counter() - t\n"
+        "eager = [m for m in ('openpyxl', 'reportlab') if m in sys.modules]\n"
+        # ru_maxrss survives exec, so it would report the parent's peak;
+        # VmHWM belongs to this process image only
+        "try:\n"
+        "    peak = next(int(l.split()[1]) for l in open('/proc/self/status') if l.startswith('VmHWM:'))\n"
+        "except OSError:\n"
+        "    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+        "print(elapsed, peak, ','.join(eager) or '-')\n"
+    )
+    out = subprocess.run([sys.executable, "-c", probe], check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+    eager = [] if out[2] == '-' else out[2].split(',')
+    return float(out[0]), int(out[1]) / 1024, eager  # both are KiB on Linux
+
+
+@app.cli.command("startup-budget")
+def startup_budget():
+    """
+    Fail if cold-start import time or peak RSS exceed
+    STARTUP_BUDGET_SECONDS / STARTUP_BUDGET_RSS_MB (see tests/test_startup.py).
+    """
+    elapsed, rss_mb, eager = measure_startup()
+    budget_s = app.config["STARTUP_BUDGET_SECONDS"]
+    budget_mb = app.config["STARTUP_BUDGET_RSS_MB"]
+    print(f"import time {elapsed:.3f}s (budget {budget_s}s), RSS {rss_mb:.1f} MB (budget {budget_mb} MB)")
+    if eager:
+        raise SystemExit(f"Export libraries imported at startup: {', '.join(eager)}")
+    if elapsed > budget_s or rss_mb > budget_mb:
+        raise SystemExit("Startup budget exceeded")
 
 
 if __name__ == "__main__":
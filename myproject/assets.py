@@ -0,0 +1,261 @@
+"""
+Static asset pipeline.
+
+`flask --app app build-assets` copies every file in static/ into
+static/dist/ under a content-hashed name, writes resized WebP/AVIF (and
+re-encoded original format) variants of images, gzip/brotli copies of
+compressible text files, and a manifest.json describing all of it.
+
+At runtime, templates call asset_url('homepage.jpg') (same arguments as
+url_for('static', filename=...)). The result is a fingerprinted /assets/ URL
+served with a one-year immutable Cache-Control. The /assets/ route picks
+the best precompressed encoding and, for images, the best format the
+browser accepts. Without a build the helpers fall back to plain /static/
+URLs, so the app works unchanged in development.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map"}
+# Image formats written for every width, best first; the original format is
+# always kept as the fallback
+IMAGE_FORMATS = ("avif", "webp")
+IMAGE_QUALITY = {"avif": 50, "webp": 75, "jpeg": 80}
+DEFAULT_WIDTHS = (480, 960, 1600)
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+_MIMETYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+
+def _ext_key(ext):
+    # Variant key for a file extension: ".JPEG" -> "jpg"
+    ext = ext.lower().lstrip(".")
+    return "jpg" if ext == "jpeg" else ext
+
+
+def _content_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def _precompress(path):
+    """
+    Write path.gz (and path.br when the brotli module is installed).
+    Returns the encodings written.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    encodings = []
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    encodings.append("gzip")
+    try:
+        import brotli
+    except ImportError:
+        return encodings
+    with open(path + ".br", "wb") as f:
+        f.write(brotli.compress(data, quality=11))
+    encodings.append("br")
+    return encodings
+
+
+def _image_variants(src, out_dir, stem, digest, widths):
+    """
+    Write resized copies of an image in every supported format.
+    Returns {ext: {"<width>": filename}} and the original width.
+    """
+    from PIL import Image, features
+
+    variants = {}
+    with Image.open(src) as im:
+        im.load()
+        original_format = "jpeg" if im.format in ("JPEG", "MPO") else im.format.lower()
+        full_width = im.width
+        sizes = sorted({w for w in widths if w < full_width} | {full_width})
+        formats = [f for f in IMAGE_FORMATS if features.check(f)] + [original_format]
+        for width in sizes:
+            resized = im if width == full_width else im.resize(
+                (width, round(im.height * width / full_width)), Image.LANCZOS)
+            for fmt in formats:
+                ext = "jpg" if fmt == "jpeg" else fmt
+                name = f"{stem}.{digest}.{width}.{ext}"
+                frame = resized.convert("RGB") if fmt == "jpeg" and resized.mode != "RGB" else resized
+                frame.save(os.path.join(out_dir, name), fmt.upper(), quality=IMAGE_QUALITY.get(fmt, 80), optimize=True)
+                variants.setdefault(ext, {})[str(width)] = name
+    return variants, full_width
+
+
+def build(static_dir, widths=DEFAULT_WIDTHS):
+    """
+    Rebuild static/dist and its manifest. Returns the manifest.
+    """
+    out_dir = os.path.join(static_dir, DIST_DIRNAME)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != out_dir]
+        for filename in sorted(files):
+            src = os.path.join(root, filename)
+            rel = os.path.relpath(src, static_dir).replace(os.sep, "/")
+            stem, ext = os.path.splitext(rel)
+            digest = _content_hash(src)
+            hashed = f"{stem}.{digest}{ext}"
+            dest = os.path.join(out_dir, hashed)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copyfile(src, dest)
+
+            entry = {"path": hashed}
+            if ext.lower() in COMPRESSIBLE_EXTENSIONS:
+                entry["encodings"] = _precompress(dest)
+            elif ext.lower() in IMAGE_EXTENSIONS:
+                entry["variants"], entry["width"] = _image_variants(src, os.path.dirname(dest),
+                                                                    os.path.basename(stem), digest, widths)
+                # Variant paths are relative to dist/, like "path"
+                prefix = os.path.dirname(hashed)
+                if prefix:
+                    entry["variants"] = {fmt: {w: f"{prefix}/{n}" for w, n in by_width.items()}
+                                         for fmt, by_width in entry["variants"].items()}
+                # Serve the re-encoded full-size image when it beats the upload
+                full = entry["variants"][_ext_key(ext)][str(entry["width"])]
+                if os.path.getsize(os.path.join(out_dir, full)) < os.path.getsize(dest):
+                    entry["path"] = full
+            manifest[rel] = entry
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+# ---------------- Runtime ----------------
+_manifest = None
+_by_path = None  # built path -> (manifest entry, image width or None)
+
+
+def get_manifest():
+    """
+    Manifest from the last build ({} when assets have not been built).
+    """
+    global _manifest, _by_path
+    if _manifest is None:
+        path = os.path.join(current_app.static_folder, DIST_DIRNAME, MANIFEST_NAME)
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        by_path = {}
+        for entry in manifest.values():
+            # Every width variant is negotiable, not only the full-size path
+            for by_width in entry.get("variants", {}).values():
+                for width, name in by_width.items():
+                    by_path[name] = (entry, width)
+            by_path[entry["path"]] = (entry, str(entry["width"]) if "variants" in entry else None)
+        _by_path = by_path
+        _manifest = manifest
+    return _manifest
+
+
+def asset_url(filename, width=None, fmt=None):
+    """
+    Fingerprinted URL for a static file; optionally a specific image width
+    (the largest built width not above it) and format (avif/webp/jpg/png).
+    """
+    entry = get_manifest().get(filename)
+    if entry is None:
+        return url_for("static", filename=filename)
+    path = entry["path"]
+    if (width or fmt) and "variants" in entry:
+        ext = fmt or _ext_key(os.path.splitext(path)[1])
+        by_width = entry["variants"].get(ext)
+        if by_width:
+            sizes = sorted(int(w) for w in by_width)
+            chosen = max([w for w in sizes if w <= width] or sizes[:1]) if width else sizes[-1]
+            path = by_width[str(chosen)]
+    return url_for("asset", filename=path)
+
+
+def asset_srcset(filename, fmt=None):
+    """
+    srcset attribute value listing every built width of an image.
+    """
+    entry = get_manifest().get(filename)
+    if entry is None or "variants" not in entry:
+        return ""
+    ext = fmt or _ext_key(os.path.splitext(entry["path"])[1])
+    by_width = entry["variants"].get(ext, {})
+    return ", ".join(f"{url_for('asset', filename=name)} {w}w"
+                     for w, name in sorted(by_width.items(), key=lambda kv: int(kv[0])))
+
+
+def _negotiate_image(filename):
+    # Serve the same width in the best format the client accepts
+    get_manifest()
+    entry, width = _by_path.get(filename, (None, None))
+    if width is None:
+        return filename, None
+    accept = request.headers.get("Accept", "")
+    for fmt in IMAGE_FORMATS:
+        if _MIMETYPES[fmt] in accept and width in entry["variants"].get(fmt, {}):
+            return entry["variants"][fmt][width], _MIMETYPES[fmt]
+    return filename, None
+
+
+def serve_asset(filename):
+    """
+    Serve a built asset with an immutable cache lifetime, choosing a
+    precompressed copy or a better image format when the client accepts it.
+    """
+    dist = os.path.join(current_app.static_folder, DIST_DIRNAME)
+    served, mimetype = filename, None
+    encoding = None
+    vary = []
+
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        served, mimetype = _negotiate_image(filename)
+        vary.append("Accept")
+    elif ext in COMPRESSIBLE_EXTENSIONS:
+        accepted = request.headers.get("Accept-Encoding", "")
+        for enc, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if enc in accepted and os.path.exists(os.path.join(dist, filename + suffix)):
+                served, encoding = filename + suffix, enc
+                break
+        vary.append("Accept-Encoding")
+
+    if encoding:
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    resp = send_from_directory(dist, served, mimetype=mimetype, max_age=CACHE_MAX_AGE, conditional=True)
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    if vary:
+        resp.vary.update(vary)
+    return resp
+
+
+def init_app(app):
+    app.add_url_rule("/assets/<path:filename>", "asset", serve_asset)
+    app.jinja_env.globals.update(asset_url=asset_url, asset_srcset=asset_srcset)
+
+    @app.cli.command("build-assets")
+    def build_assets():
+        """Fingerprint, resize and precompress files in static/."""
+        manifest = build(app.static_folder, app.config.get("ASSET_IMAGE_WIDTHS", DEFAULT_WIDTHS))
+        print(f"Built {len(manifest)} assets into {os.path.join(app.static_folder, DIST_DIRNAME)}")
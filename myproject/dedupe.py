@@ -0,0 +1,141 @@
+"""
+Duplicate applicant detection.
+
+Every application with a student name stores two keys:
+
+- fingerprint: student + father name, which every such row gets;
+- mobile_fingerprint: mobile number + student name, when a full mobile
+  number is known.
+
+An applicant is a possible duplicate when either key matches, so a row
+entered with a mobile still matches one entered without. Names are reduced
+to Soundex codes so common spelling variants (Srinivas/Sreenivas,
+Laxmi/Lakshmi) still collide. Both columns are indexed, so checking a new
+submission is two index lookups and the whole-table report is a GROUP BY
+over each index.
+"""
+import re
+
+_SOUNDEX_CODES = {}
+for _letters, _digit in (("bfpv", "1"), ("cgjkqsxz", "2"), ("dt", "3"),
+                         ("l", "4"), ("mn", "5"), ("r", "6")):
+    for _ch in _letters:
+        _SOUNDEX_CODES[_ch] = _digit
+
+
+def soundex(word):
+    """
+    American Soundex code of an ASCII word, e.g. soundex("srinivas") == "S651".
+    """
+    word = re.sub(r"[^a-z]", "", word.lower())
+    if not word:
+        return ""
+    first = word[0]
+    code = first.upper()
+    last = _SOUNDEX_CODES.get(first, "")
+    for ch in word[1:]:
+        digit = _SOUNDEX_CODES.get(ch, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code
+        if ch not in "hw":
+            last = digit
+    return code.ljust(4, "0")
+
+
+def name_key(name):
+    """
+    Order-insensitive phonetic key for a person's name. Initials are
+    dropped so "K. Srinivas" and "Srinivas K" both give "S651".
+    """
+    words = [w for w in re.split(r"[^A-Za-z]+", name or "") if len(w) > 1]
+    return " ".join(sorted(soundex(w) for w in words))
+
+
+def normalize_mobile(mobile):
+    """
+    Last 10 digits of a phone number, dropping +91 / 0 prefixes and punctuation.
+    """
+    digits = re.sub(r"\D", "", mobile or "")
+    return digits[-10:] if len(digits) >= 10 else digits
+
+
+def fingerprint(student_name, father_name=None):
+    """
+    Name key (student + father) for duplicate detection, or None when there
+    is no student name to compare.
+    """
+    student = name_key(student_name)
+    if not student:
+        return None
+    return f"{student}|{name_key(father_name)}"
+
+
+def mobile_fingerprint(student_name, mobile=None):
+    """
+    Mobile key (full mobile number + student name), or None without a
+    student name or a 10-digit mobile number.
+    """
+    student = name_key(student_name)
+    phone = normalize_mobile(mobile)
+    if not student or len(phone) != 10:
+        return None
+    return f"{phone}|{student}"
+
+
+def keys(student_name, father_name=None, mobile=None):
+    """
+    (fingerprint, mobile_fingerprint) for an applicant.
+    """
+    return fingerprint(student_name, father_name), mobile_fingerprint(student_name, mobile)
+
+
+def find_duplicates(cur, fp, mobile_fp=None, application_number=None, limit=10):
+    """
+    Other applications sharing either key (one index lookup each). The
+    application being saved is excluded.
+    """
+    if not fp and not mobile_fp:
+        return []
+    cur.execute("""
+        SELECT application_number, student_name, father_name, mobile, coordinator, status
+        FROM applications
+        WHERE (fingerprint = ? OR mobile_fingerprint = ?) AND application_number IS NOT ?
+        ORDER BY id
+        LIMIT ?
+    """, (fp, mobile_fp, application_number, limit))
+    return [
+        {
+            "application_number": r[0],
+            "student_name": r[1],
+            "father_name": r[2],
+            "mobile": r[3],
+            "coordinator": r[4],
+            "status": r[5],
+        }
+        for r in cur.fetchall()
+    ]
+
+
+def duplicate_clusters(cur):
+    """
+    All groups of applications sharing a name key or a mobile key, one pass
+    over each index. match says which key the group shares.
+    """
+    clusters = []
+    for match, column in (("name", "fingerprint"), ("mobile", "mobile_fingerprint")):
+        cur.execute(f"""
+            SELECT {column}, COUNT(*) AS cnt, GROUP_CONCAT(application_number, ',') AS apps
+            FROM applications
+            WHERE {column} IS NOT NULL
+            GROUP BY {column}
+            HAVING COUNT(*) > 1
+        """)
+        clusters.extend(
+            {"match": match, "fingerprint": r[0], "count": r[1], "application_numbers": r[2].split(",")}
+            for r in cur.fetchall()
+        )
+    clusters.sort(key=lambda c: c["count"], reverse=True)
+    return clusters
@@ -0,0 +1,181 @@
+"""
+Export backends for the download routes.
+
+Each format registers a writer function here. The heavy libraries
+(openpyxl, reportlab) are imported inside the writers, so a worker only
+pays for them the first time someone actually downloads that format.
+"""
+import csv
+import io
+from operator import attrgetter
+
+from repository import row_getter
+
+# format -> {"writer", "mimetype", "extension"}
+EXPORT_BACKENDS = {}
+
+# Column order shared by every export format
+EXPORT_COLUMNS = [
+    ("application_number", "Application No"),
+    ("student_name", "Student Name"),
+    ("father_name", "Father Name"),
+    ("mobile", "Mobile"),
+    ("address", "Address"),
+    ("preferred_branch", "Department"),
+    ("form_data", "Form Data"),
+    ("date_submitted", "Date Submitted"),
+]
+
+
+def register_backend(fmt, mimetype, extension):
+    """
+    Decorator that registers a writer for an export format.
+    Writers are called as writer(rows, buf, **options), where rows is an
+    iterable of repository.Application records, and write into buf.
+    """
+    def decorator(writer):
+        EXPORT_BACKENDS[fmt] = {
+            "writer": writer,
+            "mimetype": mimetype,
+            "extension": extension,
+        }
+        return writer
+    return decorator
+
+
+def get_backend(fmt):
+    """
+    Return the registered backend for fmt, or None if the format is unknown.
+    """
+    return EXPORT_BACKENDS.get(fmt)
+
+
+def export_rows(fmt, rows, buf=None, **options):
+    """
+    Render rows with the backend for fmt into buf (a new BytesIO by default)
+    and return it positioned at 0.
+    """
+    backend = get_backend(fmt)
+    if backend is None:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if buf is None:
+        buf = io.BytesIO()
+    backend["writer"](rows, buf, **options)
+    buf.seek(0)
+    return buf
+
+
+# ---------------- Streaming feeds ----------------
+# Rows encoded per yielded chunk
+STREAM_BATCH = 500
+
+
+def iter_csv(rows, fields):
+    """
+    Yield a CSV document (header + one line per record) in chunks.
+    """
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(fields)
+    values = row_getter(fields)
+    for n, r in enumerate(rows, 1):
+        writer.writerow(values(r))
+        if n % STREAM_BATCH == 0:
+            yield out.getvalue().encode()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue().encode()
+
+
+def iter_ndjson(rows, fields, dumps_bytes):
+    """
+    Yield newline-delimited JSON, one object per record, in chunks.
+    """
+    get = attrgetter(*fields)
+    batch = []
+    for r in rows:
+        batch.append(dumps_bytes(dict(zip(fields, get(r)))))
+        if len(batch) >= STREAM_BATCH:
+            yield b"\n".join(batch) + b"\n"
+            batch = []
+    if batch:
+        yield b"\n".join(batch) + b"\n"
+
+
+# format -> mimetype for /export
+STREAM_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+# ---------------- CSV ----------------
+@register_backend("csv", "text/csv", "csv")
+def write_csv(rows, buf, **options):
+    text = io.TextIOWrapper(buf, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    values = row_getter([k for k, _ in EXPORT_COLUMNS])
+    writer.writerow([label for _, label in EXPORT_COLUMNS])
+    for r in rows:
+        writer.writerow(values(r))
+    text.flush()
+    # Keep buf open for the caller
+    text.detach()
+
+
+# ---------------- XLSX ----------------
+@register_backend("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx")
+def write_xlsx(rows, buf, chart=False, **options):
+    import openpyxl
+    from openpyxl.chart import PieChart, Reference
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Applications"
+
+    values = row_getter([k for k, _ in EXPORT_COLUMNS])
+    ws.append([label for _, label in EXPORT_COLUMNS])
+
+    dept_count = {}
+    for r in rows:
+        ws.append(values(r))
+        dept = r.preferred_branch
+        if dept:
+            dept_count[dept] = dept_count.get(dept, 0) + 1
+
+    if chart and dept_count:
+        ws_chart = wb.create_sheet(title="Department Pie Chart")
+        ws_chart.append(["Department", "Count"])
+        for dept, count in dept_count.items():
+            ws_chart.append([dept, count])
+        pie = PieChart()
+        data = Reference(ws_chart, min_col=2, min_row=1, max_row=len(dept_count)+1)
+        labels = Reference(ws_chart, min_col=1, min_row=2, max_row=len(dept_count)+1)
+        pie.add_data(data, titles_from_data=True)
+        pie.set_categories(labels)
+        pie.title = "Students by Department"
+        ws_chart.add_chart(pie, "E5")
+
+    wb.save(buf)
+
+
+# ---------------- PDF ----------------
+PDF_COLUMNS = [
+    ("application_number", "App No"),
+    ("student_name", "Student"),
+    ("father_name", "Father"),
+    ("mobile", "Mobile"),
+    ("address", "Address"),
+    ("preferred_branch", "Dept"),
+    ("date_submitted", "Date Submitted"),
+]
+
+
+@register_backend("pdf", "application/pdf", "pdf")
+def write_pdf(rows, buf, title="Applications", workers=None, **options):
+    import pdf_report
+
+    values = row_getter([k for k, _ in PDF_COLUMNS])
+    # Plain string tuples: cheap to pickle for the render pool
+    table = [tuple(str(v) for v in values(r)) for r in rows]
+    pdf_report.render([label for _, label in PDF_COLUMNS], table, buf, title=title, workers=workers)
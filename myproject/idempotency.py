@@ -0,0 +1,57 @@
+"""
+Idempotency keys for write endpoints.
+
+The client sends an Idempotency-Key header and reuses it when it retries
+the same request. The first request's response is stored under the key in
+the same transaction as the write, so a replay (including one racing the
+original, since writers take BEGIN IMMEDIATE) returns the stored response
+without touching applications. Keys are scoped per coordinator; reusing a
+key with a different body is rejected. Old keys are pruned by the
+prune_idempotency_keys maintenance task.
+"""
+import datetime
+import hashlib
+import json
+
+HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+KEY_TTL = 24 * 3600  # seconds
+MAX_KEY_LENGTH = 255
+
+
+def request_hash(data):
+    """
+    Stable digest of a JSON request body.
+    """
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def lookup(cur, owner_id, key):
+    """
+    Stored (request_hash, status_code, body) for a key, or None.
+    """
+    cur.execute("""
+        SELECT request_hash, status_code, response FROM idempotency_keys
+        WHERE owner_id = ? AND key = ?
+    """, (owner_id, key))
+    row = cur.fetchone()
+    return None if row is None else (row[0], row[1], row[2])
+
+
+def store(cur, owner_id, key, req_hash, status_code, body):
+    cur.execute("""
+        INSERT INTO idempotency_keys (owner_id, key, request_hash, status_code, response, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (owner_id, key, req_hash, status_code, body,
+          datetime.datetime.utcnow().isoformat(sep=' ', timespec='seconds')))
+
+
+def prune(db, ttl=KEY_TTL):
+    """
+    Delete keys older than ttl seconds. Returns the number removed.
+    """
+    cutoff = (datetime.datetime.utcnow() - datetime.timedelta(seconds=ttl)).isoformat(sep=' ', timespec='seconds')
+    cur = db.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (cutoff,))
+    db.commit()
+    return cur.rowcount
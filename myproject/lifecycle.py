@@ -0,0 +1,118 @@
+"""
+Application status lifecycle.
+
+Statuses move along the transitions in the status_transitions table
+(seeded from TRANSITIONS; admins can add rows). Triggers on applications
+(see migrate_v8 in app.py) write an append-only status_history row and
+update the precomputed status_counts table in the same transaction as every
+status change, whichever code path makes it:
+
+  status_history(application_id, from_status, to_status, changed_at,
+                 seconds_in_stage)
+
+seconds_in_stage is how long the application spent in from_status, so
+time-in-stage percentiles are read from the (from_status, seconds_in_stage)
+index and per-stage counts from status_counts, with no table scan.
+A deleted application gets a final row with to_status NULL.
+"""
+STAGES = ("reserved", "submitted", "verified", "fee_paid", "allotted", "rejected", "withdrawn")
+
+TRANSITIONS = (
+    ("reserved", "submitted"),
+    ("submitted", "verified"),
+    ("submitted", "rejected"),
+    ("submitted", "withdrawn"),
+    ("verified", "fee_paid"),
+    ("verified", "rejected"),
+    ("verified", "withdrawn"),
+    ("fee_paid", "allotted"),
+    ("fee_paid", "withdrawn"),
+    ("allotted", "withdrawn"),
+)
+
+PERCENTILES = (50, 90, 99)
+
+
+def allowed_transitions(cur):
+    """
+    {from_status: [to_status, ...]} from the status_transitions table.
+    """
+    cur.execute("SELECT from_status, to_status FROM status_transitions ORDER BY from_status, to_status")
+    allowed = {}
+    for from_status, to_status in cur.fetchall():
+        allowed.setdefault(from_status, []).append(to_status)
+    return allowed
+
+
+def transition(db, application_number, to_status, now):
+    """
+    Move an application to to_status if the lifecycle allows it; the
+    history row and counts are written by triggers in this transaction.
+    Returns the previous status. Raises LookupError when the application
+    does not exist and ValueError when the move is not allowed.
+    """
+    cur = db.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("SELECT status FROM applications WHERE application_number = ?", (application_number,))
+        row = cur.fetchone()
+        if row is None:
+            raise LookupError(application_number)
+        from_status = row[0]
+        cur.execute("SELECT 1 FROM status_transitions WHERE from_status = ? AND to_status = ?",
+                    (from_status, to_status))
+        if cur.fetchone() is None:
+            raise ValueError(f"Cannot move {application_number} from {from_status} to {to_status}")
+        cur.execute("UPDATE applications SET status = ?, last_modified = ? WHERE application_number = ?",
+                    (to_status, now, application_number))
+        db.commit()
+        return from_status
+    except Exception:
+        db.rollback()
+        raise
+
+
+def history(db, application_id):
+    cur = db.cursor()
+    cur.execute("""
+        SELECT from_status, to_status, changed_at, seconds_in_stage
+        FROM status_history WHERE application_id = ? ORDER BY id
+    """, (application_id,))
+    cols = ("from_status", "to_status", "changed_at", "seconds_in_stage")
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def _time_in_stage(cur, stage):
+    # Completed stays in stage: count, then one index seek per percentile
+    cur.execute("""
+        SELECT COUNT(seconds_in_stage) FROM status_history
+        WHERE from_status = ? AND seconds_in_stage IS NOT NULL
+    """, (stage,))
+    n = cur.fetchone()[0]
+    stats = {"completed": n}
+    for p in PERCENTILES:
+        if n == 0:
+            stats[f"p{p}"] = None
+            continue
+        cur.execute("""
+            SELECT seconds_in_stage FROM status_history
+            WHERE from_status = ? AND seconds_in_stage IS NOT NULL
+            ORDER BY seconds_in_stage LIMIT 1 OFFSET ?
+        """, (stage, (n - 1) * p // 100))
+        stats[f"p{p}"] = round(cur.fetchone()[0], 1)
+    return stats
+
+
+def funnel(db):
+    """
+    Per-stage current counts and time-in-stage percentiles (seconds), in
+    lifecycle order; statuses outside STAGES are listed after them.
+    """
+    cur = db.cursor()
+    cur.execute("SELECT status, count FROM status_counts")
+    counts = dict(cur.fetchall())
+    stages = list(STAGES) + sorted(s for s in counts if s not in STAGES)
+    return [
+        {"status": stage, "count": counts.get(stage, 0), "time_in_stage": _time_in_stage(cur, stage)}
+        for stage in stages
+    ]
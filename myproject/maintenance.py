@@ -0,0 +1,205 @@
+"""
+Scheduled SQLite maintenance.
+
+Tasks:
+  optimize           PRAGMA optimize (refreshes stale planner statistics)
+  incremental_vacuum PRAGMA incremental_vacuum(N) (returns free pages from
+                     deleted reservations to the filesystem)
+  checkpoint         PRAGMA wal_checkpoint(TRUNCATE) (folds the WAL back
+                     into the database and truncates it)
+  integrity_check    PRAGMA quick_check, or the full integrity_check
+  prune_idempotency_keys
+                     deletes idempotency keys older than IDEMPOTENCY_KEY_TTL
+
+Every run is recorded in the maintenance_runs table with its duration and
+result. Before a task runs, the scheduler claims it in a BEGIN IMMEDIATE
+transaction against that table, so with several worker processes each
+task still runs once per interval.
+"""
+import datetime
+import threading
+import time
+
+import idempotency
+
+TASKS = ("optimize", "incremental_vacuum", "checkpoint", "integrity_check", "prune_idempotency_keys")
+
+# Seconds between runs of each task; None disables a task
+DEFAULT_SCHEDULE = {
+    "optimize": 3600,
+    "incremental_vacuum": 6 * 3600,
+    "checkpoint": 300,
+    "integrity_check": 24 * 3600,
+    "prune_idempotency_keys": 3600,
+}
+# How often the scheduler thread wakes up to look for due tasks
+SCHEDULER_TICK = 30
+
+
+def _now():
+    return datetime.datetime.utcnow().isoformat(sep=' ', timespec='seconds')
+
+
+# ---------------- Connection tuning ----------------
+def configure_connection(db, config):
+    """
+    Per-connection PRAGMAs; called for every new connection.
+    """
+    mmap_size = config.get("SQLITE_MMAP_SIZE", 0)
+    if mmap_size:
+        db.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+
+
+def configure_database(db, config):
+    """
+    Persistent database settings: WAL journaling, incremental auto-vacuum
+    and page size. Changing auto_vacuum or page_size on an existing file
+    needs a full VACUUM, which is done here once; afterwards this is a few
+    PRAGMA reads. Must run outside a transaction.
+    """
+    db.execute("PRAGMA journal_mode = WAL")
+    page_size = int(config.get("SQLITE_PAGE_SIZE", 4096))
+    current_page_size = db.execute("PRAGMA page_size").fetchone()[0]
+    auto_vacuum = db.execute("PRAGMA auto_vacuum").fetchone()[0]
+    if auto_vacuum != 2 or current_page_size != page_size:
+        # page_size cannot change while in WAL mode
+        db.execute("PRAGMA journal_mode = DELETE")
+        db.execute(f"PRAGMA page_size = {page_size}")
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        db.execute("VACUUM")
+        db.execute("PRAGMA journal_mode = WAL")
+
+
+# ---------------- Tasks ----------------
+def run_task(db, task, config):
+    """
+    Run one task on db and return a short result string.
+    """
+    if task == "optimize":
+        db.execute("PRAGMA optimize")
+        return "ok"
+    if task == "incremental_vacuum":
+        before = db.execute("PRAGMA freelist_count").fetchone()[0]
+        pages = int(config.get("MAINTENANCE_VACUUM_PAGES", 0))
+        # incremental_vacuum returns no rows but must be stepped to completion
+        db.execute(f"PRAGMA incremental_vacuum({pages})" if pages else "PRAGMA incremental_vacuum").fetchall()
+        after = db.execute("PRAGMA freelist_count").fetchone()[0]
+        return f"freed {before - after} pages ({after} free)"
+    if task == "checkpoint":
+        busy, log_frames, checkpointed = db.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return f"busy={busy} log={log_frames} checkpointed={checkpointed}"
+    if task == "integrity_check":
+        pragma = "integrity_check" if config.get("MAINTENANCE_FULL_INTEGRITY_CHECK") else "quick_check"
+        problems = [r[0] for r in db.execute(f"PRAGMA {pragma}").fetchall()]
+        return "ok" if problems == ["ok"] else "; ".join(problems[:20])
+    if task == "prune_idempotency_keys":
+        removed = idempotency.prune(db, config.get("IDEMPOTENCY_KEY_TTL", idempotency.KEY_TTL))
+        return f"removed {removed} keys"
+    raise ValueError(f"Unknown maintenance task: {task}")
+
+
+def _claim(db, task, interval):
+    """
+    Record a run of task if it is due. Returns the run id, or None when
+    another process ran it within the interval.
+    """
+    cur = db.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("SELECT MAX(started_at) FROM maintenance_runs WHERE task = ?", (task,))
+        last = cur.fetchone()[0]
+        if interval is not None and last is not None:
+            last_dt = datetime.datetime.fromisoformat(last)
+            if (datetime.datetime.utcnow() - last_dt).total_seconds() < interval:
+                db.rollback()
+                return None
+        cur.execute("INSERT INTO maintenance_runs (task, started_at) VALUES (?, ?)", (task, _now()))
+        run_id = cur.lastrowid
+        db.commit()
+        return run_id
+    except Exception:
+        db.rollback()
+        raise
+
+
+def run(connect, task, config, interval=None):
+    """
+    Claim and run one task on a fresh connection. Returns a report dict, or
+    None when the task was not due.
+    """
+    db = connect()
+    try:
+        run_id = _claim(db, task, interval)
+        if run_id is None:
+            return None
+        start = time.perf_counter()
+        try:
+            result = run_task(db, task, config)
+            ok = True
+        except Exception as e:
+            result, ok = f"error: {e}", False
+        duration_ms = round((time.perf_counter() - start) * 1000, 1)
+        db.execute("UPDATE maintenance_runs SET duration_ms = ?, ok = ?, result = ? WHERE id = ?",
+                   (duration_ms, int(ok), result, run_id))
+        db.commit()
+        return {"task": task, "ok": ok, "duration_ms": duration_ms, "result": result}
+    finally:
+        db.close()
+
+
+def run_due(connect, config):
+    """
+    Run every task whose interval has elapsed. Returns the reports.
+    """
+    schedule = config.get("MAINTENANCE_SCHEDULE", DEFAULT_SCHEDULE)
+    reports = []
+    for task in TASKS:
+        interval = schedule.get(task)
+        if interval is None:
+            continue
+        report = run(connect, task, config, interval)
+        if report:
+            reports.append(report)
+    return reports
+
+
+def recent_runs(db, limit=50):
+    cur = db.cursor()
+    cur.execute("""
+        SELECT task, started_at, duration_ms, ok, result
+        FROM maintenance_runs ORDER BY id DESC LIMIT ?
+    """, (limit,))
+    cols = ("task", "started_at", "duration_ms", "ok", "result")
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+# ---------------- Scheduler ----------------
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler(connect, config, logger=None):
+    """
+    Start the background scheduler thread (once per process).
+    """
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return _scheduler
+
+        def loop():
+            while True:
+                try:
+                    for report in run_due(connect, config):
+                        if logger:
+                            logger.info("maintenance %(task)s: %(result)s in %(duration_ms)s ms", report)
+                except Exception:
+                    if logger:
+                        logger.exception("maintenance run failed")
+                time.sleep(config.get("MAINTENANCE_TICK", SCHEDULER_TICK))
+
+        _scheduler = threading.Thread(target=loop, name="sqlite-maintenance", daemon=True)
+        _scheduler.start()
+        return _scheduler
@@ -0,0 +1,366 @@
+"""
+Table-layout PDF report engine used by the pdf export backend.
+
+Rendering happens in two passes:
+  1. measure: wrap every cell to its column width (from Helvetica font
+     metrics) and record the height of each row;
+  2. render: split the rows into pages from those heights and draw page
+     ranges, repeating the header on every page.
+
+For large reports both passes run on a process pool and the rendered page
+ranges are merged into one document with pypdf. When pypdf is not
+installed, the report is small, or the pool breaks (a worker killed by the
+OOM killer, a failed spawn), everything runs in-process on a single canvas;
+a broken pool is replaced on the next large report. Values are never
+truncated; long cells wrap onto extra lines.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+FONT = "Helvetica"
+FONT_BOLD = "Helvetica-Bold"
+FONT_SIZE = 8
+LEADING = 10
+CELL_PADDING = 3
+MARGIN = 30
+HEADER_GAP = 4
+FOOTER_HEIGHT = 20
+
+# Reports with fewer rows than this are rendered in-process
+PARALLEL_MIN_ROWS = 2000
+# Rows measured per task and pages rendered per task on the pool
+MEASURE_CHUNK_ROWS = 5000
+RENDER_CHUNK_PAGES = 50
+# Rows sampled to size the columns
+WIDTH_SAMPLE_ROWS = 5000
+# Column width never drops below this (points)
+MIN_COLUMN_WIDTH = 40
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers):
+    """
+    Lazily start the shared process pool, restarting it when a different
+    worker count is asked for. Spawned (not forked) workers are used because
+    the web server is multi-threaded.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and _pool_workers != workers:
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def discard_pool(pool):
+    """
+    Drop a broken pool so the next get_pool() starts a fresh one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _page_size():
+    from reportlab.lib.pagesizes import A4, landscape
+    return landscape(A4)
+
+
+def _canvas(out, title):
+    from reportlab.pdfgen import canvas
+
+    p = canvas.Canvas(out, pagesize=_page_size(), pageCompression=1)
+    p.setTitle(title)
+    return p
+
+
+def _save(p):
+    """
+    Save a canvas with plain zlib page streams. ASCII85 on top (reportlab's
+    global rl_config.useA85 default) only inflates the file and costs time;
+    building the page streams here keeps the choice to this canvas.
+    """
+    from reportlab.pdfbase.pdfdoc import PDFStream, PDFZCompress
+
+    for page in p._doc.Pages.pages:
+        if not page.Contents and page.stream:
+            page.Contents = PDFStream(content=page.stream, filters=[PDFZCompress])
+            page.Contents.__Comment__ = "page stream"
+    p.save()
+
+
+# ---------------- Layout ----------------
+def column_widths(headers, rows, available):
+    """
+    Size columns from the natural (unwrapped) width of their content,
+    measured on a sample of rows. Columns narrower than their fair share
+    keep their natural width; the remaining space is split between the
+    wide columns.
+    """
+    pad = 2 * CELL_PADDING
+    natural = [text_width(h, FONT_BOLD) + pad for h in headers]
+    for row in rows[:WIDTH_SAMPLE_ROWS]:
+        for i, val in enumerate(row):
+            w = text_width(val) + pad
+            if w > natural[i]:
+                natural[i] = w
+
+    widths = [None] * len(headers)
+    remaining = available
+    open_cols = list(range(len(headers)))
+    # Water-fill: settle every column that fits in an even share of what is left
+    while open_cols:
+        share = remaining / len(open_cols)
+        settled = [i for i in open_cols if natural[i] <= share]
+        if not settled:
+            for i in open_cols:
+                widths[i] = max(MIN_COLUMN_WIDTH, share)
+            break
+        for i in settled:
+            widths[i] = max(MIN_COLUMN_WIDTH, natural[i])
+            remaining -= widths[i]
+        open_cols = [i for i in open_cols if widths[i] is None]
+    return widths
+
+
+_char_widths = {}
+
+
+def text_width(text, font=FONT):
+    """
+    Width of text in points. Uses a per-character table built from the
+    font metrics once per font, which is much cheaper than calling
+    stringWidth for every cell.
+    """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    table = _char_widths.get(font)
+    if table is None:
+        table = _char_widths[font] = {chr(c): stringWidth(chr(c), font, FONT_SIZE) for c in range(32, 256)}
+    try:
+        return sum(map(table.__getitem__, text))
+    except KeyError:
+        return stringWidth(text, font, FONT_SIZE)
+
+
+def _split_word(word, width, font):
+    # Break a word wider than a whole line between characters
+    parts = []
+    start = 0
+    used = 0.0
+    for i, ch in enumerate(word):
+        w = text_width(ch, font)
+        if used + w > width and i > start:
+            parts.append(word[start:i])
+            start = i
+            used = 0.0
+        used += w
+    parts.append(word[start:])
+    return parts
+
+
+def wrap_text(text, width, font=FONT):
+    """
+    Greedy word wrap of text to width points. Words longer than a whole
+    line are broken between characters; explicit newlines are kept.
+    """
+    if not text:
+        return [""]
+    if "\n" not in text and text_width(text, font) <= width:
+        return [text]
+
+    space = text_width(" ", font)
+    lines = []
+    for para in text.split("\n"):
+        line = []
+        used = 0.0
+        for word in para.split():
+            w = text_width(word, font)
+            if w > width:
+                pieces = _split_word(word, width, font)
+                word = pieces.pop()
+                if line:
+                    lines.append(" ".join(line))
+                lines.extend(pieces)
+                line = []
+                used = 0.0
+                w = text_width(word, font)
+            if line and used + space + w > width:
+                lines.append(" ".join(line))
+                line = []
+                used = 0.0
+            used += (space if line else 0.0) + w
+            line.append(word)
+        lines.append(" ".join(line))
+    return lines
+
+
+def wrap_row(row, widths):
+    return [wrap_text(val, widths[i] - 2 * CELL_PADDING) for i, val in enumerate(row)]
+
+
+def row_height(cells):
+    return max(len(c) for c in cells) * LEADING + 2 * CELL_PADDING
+
+
+def measure_rows(rows, widths):
+    """
+    Return the height in points of each row once wrapped.
+    """
+    return [row_height(wrap_row(row, widths)) for row in rows]
+
+
+def paginate(heights, body_height):
+    """
+    Return a list of (start, end) row ranges, one per page.
+    """
+    pages = []
+    start = 0
+    used = 0
+    for i, h in enumerate(heights):
+        if used + h > body_height and i > start:
+            pages.append((start, i))
+            start = i
+            used = 0
+        used += h
+    pages.append((start, len(heights)))
+    return pages
+
+
+# ---------------- Rendering ----------------
+def _draw_header(p, headers, widths, top):
+    x = MARGIN
+    p.setFont(FONT_BOLD, FONT_SIZE)
+    for i, h in enumerate(headers):
+        p.drawString(x + CELL_PADDING, top - CELL_PADDING - FONT_SIZE, h)
+        x += widths[i]
+    y = top - LEADING - 2 * CELL_PADDING
+    p.line(MARGIN, y, MARGIN + sum(widths), y)
+    return y - HEADER_GAP
+
+
+def _draw_page(p, title, headers, widths, cells_rows, page_no, page_count):
+    page_width, page_height = _page_size()
+    p.setFont(FONT_BOLD, FONT_SIZE + 2)
+    p.drawString(MARGIN, page_height - MARGIN, title)
+    y = _draw_header(p, headers, widths, page_height - MARGIN - LEADING)
+
+    right = MARGIN + sum(widths)
+    p.setLineWidth(0.25)
+    # One text object per page: far fewer operators than drawString per line
+    t = p.beginText()
+    t.setFont(FONT, FONT_SIZE, LEADING)
+    rules = []
+    for cells in cells_rows:
+        x = MARGIN + CELL_PADDING
+        for i, lines in enumerate(cells):
+            if lines[0] or len(lines) > 1:
+                t.setTextOrigin(x, y - CELL_PADDING - FONT_SIZE)
+                for line in lines:
+                    t.textLine(line)
+            x += widths[i]
+        y -= row_height(cells)
+        rules.append((MARGIN, y, right, y))
+    p.drawText(t)
+    p.lines(rules)
+
+    p.setFont(FONT, FONT_SIZE)
+    p.drawRightString(page_width - MARGIN, MARGIN - FOOTER_HEIGHT / 2, f"Page {page_no} of {page_count}")
+    p.showPage()
+
+
+def render_pages(title, headers, widths, cells_rows, pages, first_page_no, page_count, out):
+    """
+    Draw the given page ranges (indices into cells_rows, which holds
+    already-wrapped rows) into out.
+    """
+    p = _canvas(out, title)
+    for n, (start, end) in enumerate(pages):
+        _draw_page(p, title, headers, widths, cells_rows[start:end], first_page_no + n, page_count)
+    _save(p)
+
+
+def _render_chunk(title, headers, widths, rows, pages, first_page_no, page_count):
+    # Pool task: pages are relative to the rows slice passed in
+    cells_rows = [wrap_row(row, widths) for row in rows]
+    buf = io.BytesIO()
+    render_pages(title, headers, widths, cells_rows, pages, first_page_no, page_count, buf)
+    return buf.getvalue()
+
+
+def _body_height():
+    _, page_height = _page_size()
+    return page_height - 2 * MARGIN - LEADING - (LEADING + 2 * CELL_PADDING + HEADER_GAP) - FOOTER_HEIGHT
+
+
+def render(headers, rows, out, title="Applications", parallel=None, workers=None):
+    """
+    Render rows (sequences of strings) as a paginated table into the binary
+    file-like out. parallel=None picks the process pool automatically for
+    reports of PARALLEL_MIN_ROWS rows or more when more than one worker
+    (default: CPU count) is available.
+    """
+    page_width, _ = _page_size()
+    widths = column_widths(headers, rows, page_width - 2 * MARGIN)
+
+    workers = workers or os.cpu_count() or 1
+    if parallel is None:
+        parallel = len(rows) >= PARALLEL_MIN_ROWS and workers > 1
+    if parallel:
+        try:
+            import pypdf  # noqa: F401  (merges the page chunks)
+        except ImportError:
+            parallel = False
+
+    if parallel:
+        pool = get_pool(workers)
+        try:
+            _render_parallel(pool, headers, rows, widths, out, title)
+            return
+        except BrokenProcessPool:
+            discard_pool(pool)
+
+    # Wrap once and reuse the lines for both pagination and drawing
+    cells_rows = [wrap_row(row, widths) for row in rows]
+    pages = paginate([row_height(c) for c in cells_rows], _body_height())
+    render_pages(title, headers, widths, cells_rows, pages, 1, len(pages), out)
+
+
+def _render_parallel(pool, headers, rows, widths, out, title):
+    from pypdf import PdfWriter
+
+    # Pass 1: row heights, measured in parallel
+    chunks = [rows[i:i + MEASURE_CHUNK_ROWS] for i in range(0, len(rows), MEASURE_CHUNK_ROWS)]
+    heights = []
+    for part in pool.map(measure_rows, chunks, [widths] * len(chunks)):
+        heights.extend(part)
+    pages = paginate(heights, _body_height())
+
+    # Pass 2: render page ranges in parallel, each with only its own rows
+    futures = []
+    for i in range(0, len(pages), RENDER_CHUNK_PAGES):
+        group = pages[i:i + RENDER_CHUNK_PAGES]
+        base = group[0][0]
+        local = [(s - base, e - base) for s, e in group]
+        futures.append(pool.submit(_render_chunk, title, headers, widths,
+                                   rows[base:group[-1][1]], local, i + 1, len(pages)))
+
+    writer = PdfWriter()
+    for f in futures:
+        writer.append(io.BytesIO(f.result()))
+    writer.write(out)
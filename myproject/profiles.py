@@ -0,0 +1,69 @@
+"""
+Admin / coordinator profile cache for dashboard rendering.
+
+Profiles change only through save_admin_work / save_coordinator_work, which
+call invalidate(), so dashboards can be served from this in-process cache
+instead of querying on every page view. The TTL bounds staleness across
+worker processes, where an invalidation in one process is not seen by the
+others.
+"""
+import threading
+import time
+
+PROFILE_TTL = 300  # seconds
+PROFILE_FIELDS = ("first_name", "last_name", "email", "phone", "work")
+PROFILE_TABLES = ("admins", "coordinators")
+
+_cache = {}  # (table, id) -> (expires_at, profile dict)
+_lock = threading.Lock()
+
+
+def get_profile(db, table, user_id):
+    """
+    Profile dict for an admin or coordinator, or None if the row is gone.
+    """
+    if table not in PROFILE_TABLES:
+        raise ValueError(f"Unknown profile table: {table}")
+    key = (table, user_id)
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+
+    cur = db.cursor()
+    cur.execute(f"SELECT {', '.join(PROFILE_FIELDS)} FROM {table} WHERE id=?", (user_id,))
+    row = cur.fetchone()
+    if row is None:
+        invalidate(table, user_id)
+        return None
+    profile = dict(zip(PROFILE_FIELDS, row))
+    with _lock:
+        _cache[key] = (now + PROFILE_TTL, profile)
+    return profile
+
+
+def invalidate(table, user_id):
+    with _lock:
+        _cache.pop((table, user_id), None)
+
+
+def coordinator_page(db, page=1, per_page=20):
+    """
+    One page of coordinators with their application counts, computed in a
+    single aggregate query (LEFT JOIN on the coordinator_id index).
+    Returns (coordinators, total).
+    """
+    cur = db.cursor()
+    cur.execute("SELECT COUNT(*) FROM coordinators")
+    total = cur.fetchone()[0]
+    cur.execute("""
+        SELECT c.id, c.first_name, c.last_name, c.email, c.phone, c.work,
+               COUNT(a.id) AS applications
+        FROM (SELECT * FROM coordinators ORDER BY id LIMIT ? OFFSET ?) c
+        LEFT JOIN applications a ON a.coordinator_id = c.id
+        GROUP BY c.id
+        ORDER BY c.id
+    """, (per_page, (page - 1) * per_page))
+    cols = ("id", "first_name", "last_name", "email", "phone", "work", "applications")
+    return [dict(zip(cols, r)) for r in cur.fetchall()], total
@@ -0,0 +1,247 @@
+"""
+Application repository.
+
+Rows are read straight into the Application namedtuple: one tuple per row,
+no intermediate dict(row). Every query names its columns through a
+projection; columns outside the projection are selected as NULL, so every
+query yields the same record type and serializers can rely on attribute
+access.
+"""
+import json
+from collections import namedtuple
+from operator import attrgetter
+
+APPLICATION_FIELDS = (
+    "id",
+    "application_number",
+    "numeric_part",
+    "coordinator",
+    "coordinator_id",
+    "status",
+    "student_name",
+    "father_name",
+    "preferred_branch",
+    "mobile",
+    "address",
+    "form_data",
+    "date_opened",
+    "date_submitted",
+    "last_modified",
+    "change_seq",
+    "fingerprint",
+    "mobile_fingerprint",
+)
+
+Application = namedtuple("Application", APPLICATION_FIELDS)
+
+# ---------------- Projections ----------------
+# Coordinator dashboard list
+LIST = ("application_number", "student_name", "father_name", "preferred_branch",
+        "mobile", "address", "status", "date_submitted", "form_data")
+# Coordinator student search
+SEARCH = ("application_number", "student_name", "father_name", "preferred_branch",
+          "mobile", "address")
+# Single application lookup
+DETAIL = ("id", "application_number", "numeric_part", "coordinator", "status",
+          "student_name", "father_name", "preferred_branch",
+          "form_data", "date_opened", "date_submitted", "last_modified")
+# XLSX / CSV / PDF exports
+EXPORT = ("application_number", "student_name", "father_name", "mobile", "address",
+          "preferred_branch", "form_data", "date_submitted")
+# Raw /export feed for downstream systems
+SYNC = ("id", "application_number", "status", "coordinator", "coordinator_id",
+        "student_name", "father_name", "preferred_branch", "mobile", "address",
+        "form_data", "date_opened", "date_submitted", "last_modified", "change_seq")
+# Application-number typeahead
+TYPEAHEAD = ("application_number", "numeric_part", "coordinator", "status", "student_name")
+
+# Rows pulled from sqlite per fetchmany() while iterating
+FETCH_BATCH = 500
+
+_select_cache = {}
+
+
+def select_list(projection):
+    """
+    SELECT column list for a projection, in Application field order with
+    NULL for columns outside the projection.
+    """
+    sql = _select_cache.get(projection)
+    if sql is None:
+        wanted = set(projection)
+        sql = _select_cache[projection] = ", ".join(
+            f if f in wanted else f"NULL AS {f}" for f in APPLICATION_FIELDS
+        )
+    return sql
+
+
+def _record_factory(cursor, row):
+    return Application._make(row)
+
+
+def iter_applications(db, projection, where="", params=(), order_by="", limit=None):
+    """
+    Yield Application records matching where/params, fetched in batches of
+    FETCH_BATCH so large result sets are never held in memory at once.
+    Qualify order_by columns (applications.id): a bare name would bind to
+    the NULL alias when the column is outside the projection.
+    """
+    sql = f"SELECT {select_list(projection)} FROM applications"
+    if where:
+        sql += f" WHERE {where}"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params = (*params, limit)
+
+    cur = db.cursor()
+    cur.row_factory = _record_factory
+    cur.execute(sql, params)
+    while True:
+        batch = cur.fetchmany(FETCH_BATCH)
+        if not batch:
+            break
+        yield from batch
+
+
+def get_by_number(db, application_number, projection=DETAIL):
+    """
+    Application with the given number, or None.
+    """
+    return next(iter_applications(db, projection, "application_number = ?",
+                                  (application_number,), limit=1), None)
+
+
+def for_coordinator(db, coordinator_id, projection=LIST):
+    return iter_applications(db, projection, "coordinator_id = ?", (coordinator_id,), order_by="applications.id DESC")
+
+
+def search_for_coordinator(db, coordinator_id, term, projection=SEARCH):
+    """
+    Case-insensitive substring search on student name / application number
+    within one coordinator's applications.
+    """
+    like = f"%{term.lower()}%"
+    return iter_applications(
+        db, projection,
+        "coordinator_id = ? AND (LOWER(student_name) LIKE ? OR LOWER(application_number) LIKE ?)",
+        (coordinator_id, like, like),
+    )
+
+
+def with_numeric_parts(db, numbers, projection=TYPEAHEAD):
+    """
+    Applications whose numeric_part is in numbers, ascending.
+    """
+    if not numbers:
+        return iter(())
+    marks = ", ".join("?" * len(numbers))
+    return iter_applications(db, projection, f"numeric_part IN ({marks})", tuple(numbers),
+                             order_by="applications.numeric_part")
+
+
+def with_number_prefix(db, ranges, limit, projection=TYPEAHEAD):
+    """
+    Up to limit applications whose numeric_part falls in the (lo, hi)
+    ranges (see typeahead.prefix_ranges), one index range seek per range.
+    """
+    for lo, hi in ranges:
+        for record in iter_applications(db, projection, "numeric_part BETWEEN ? AND ?", (lo, hi),
+                                        order_by="applications.numeric_part", limit=limit):
+            yield record
+            limit -= 1
+        if limit <= 0:
+            return
+
+
+def submitted_between(db, start, end, projection=EXPORT):
+    return iter_applications(db, projection, "date_submitted BETWEEN ? AND ?",
+                             (start + " 00:00:00", end + " 23:59:59"))
+
+
+def filtered(db, projection, start=None, end=None, status=None, branch=None,
+             coordinator_id=None, since=None, since_seq=None, limit=None):
+    """
+    Applications matching the /export filters, ordered by change_seq.
+    start/end bound date_submitted (inclusive dates); since is a lower bound
+    on last_modified. since_seq is the keyset cursor: only rows changed
+    after the change with that sequence number.
+    """
+    clauses, params = [], []
+    if start:
+        clauses.append("date_submitted >= ?")
+        params.append(start + " 00:00:00")
+    if end:
+        clauses.append("date_submitted <= ?")
+        params.append(end + " 23:59:59")
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if branch:
+        clauses.append("preferred_branch = ?")
+        params.append(branch)
+    if coordinator_id is not None:
+        clauses.append("coordinator_id = ?")
+        params.append(coordinator_id)
+    if since:
+        clauses.append("last_modified >= ?")
+        params.append(since)
+    if since_seq is not None:
+        # Range seek on the change_seq index
+        clauses.append("applications.change_seq > ?")
+        params.append(since_seq)
+    return iter_applications(db, projection, " AND ".join(clauses), tuple(params),
+                             order_by="applications.change_seq", limit=limit)
+
+
+# ---------------- Serializers ----------------
+def parse_form_data(app):
+    """
+    form_data JSON as a dict, or None when absent or malformed.
+    """
+    if not app.form_data:
+        return None
+    try:
+        return json.loads(app.form_data)
+    except Exception:
+        return None
+
+
+def to_dict(app, fields):
+    """
+    JSON-ready dict with the given fields; form_data is decoded.
+    """
+    out = {f: getattr(app, f) for f in fields}
+    if out.get("form_data"):
+        parsed = parse_form_data(app)
+        if parsed is not None:
+            out["form_data"] = parsed
+    return out
+
+
+def to_list_item(app):
+    """
+    Dashboard list entry; blank columns fall back to the value stored in
+    form_data.
+    """
+    form_json = parse_form_data(app) or {}
+    return {
+        "application_number": app.application_number or "",
+        "student_name": app.student_name or form_json.get('student_name', ""),
+        "father_name": app.father_name or form_json.get('father_name', ""),
+        "preferred_branch": app.preferred_branch or form_json.get('preferred_branch', ""),
+        "mobile": app.mobile or form_json.get('mobile', ""),
+        "address": app.address or form_json.get('address', ""),
+        "status": app.status,
+        "date_submitted": app.date_submitted,
+    }
+
+
+def row_getter(keys):
+    """
+    Function returning the values of keys (two or more) from a record as a
+    list, with None rendered as '' (one row of an XLSX/CSV/PDF table).
+    """
+    get = attrgetter(*keys)
+    return lambda app: ['' if v is None else v for v in get(app)]
@@ -0,0 +1,148 @@
+"""
+JSON serialization and response compression for the JSON API routes.
+
+- FastJSONProvider: Flask JSON provider that encodes with orjson when it
+  is installed and falls back to the standard library otherwise.
+- stream_json_object(): streams {"key": [item, ...]} without building the
+  list (or the encoded document) in memory.
+- init_compression(): after_request hook that gzip/brotli-compresses
+  compressible responses above a size threshold, including streamed ones,
+  according to the client's Accept-Encoding.
+"""
+import gzip
+import zlib
+
+from flask import Response, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "text/csv",
+                          "text/html", "text/plain", "text/css", "application/javascript"}
+# Items encoded per yielded chunk when streaming an array
+STREAM_BATCH = 200
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    orjson-backed JSON provider. Non-native types (dates, Decimal, ...) go
+    through the default provider's conversion.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def dumps_bytes(self, obj):
+        if orjson is None:
+            return super().dumps(obj).encode()
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+def stream_json_object(key, items, serialize, dumps_bytes, status=200):
+    """
+    Response streaming {"key": [serialize(item), ...]} as items are produced.
+    """
+    def generate():
+        yield b'{"' + key.encode() + b'":['
+        batch = []
+        first = True
+        for item in items:
+            batch.append(dumps_bytes(serialize(item)))
+            if len(batch) >= STREAM_BATCH:
+                yield (b"" if first else b",") + b",".join(batch)
+                first = False
+                batch = []
+        if batch:
+            yield (b"" if first else b",") + b",".join(batch)
+        yield b"]}\n"
+
+    return Response(stream_with_context(generate()), status=status, mimetype="application/json")
+
+
+# ---------------- Compression ----------------
+def _choose_encoding():
+    accepted = request.headers.get("Accept-Encoding", "").lower()
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress_stream(chunks, encoding):
+    try:
+        if encoding == "br":
+            compressor = brotli.Compressor()
+            for chunk in chunks:
+                out = compressor.process(chunk)
+                if out:
+                    yield out
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+            for chunk in chunks:
+                out = compressor.compress(chunk)
+                if out:
+                    yield out
+            yield compressor.flush()
+    finally:
+        # Werkzeug only closes the outermost iterable; pass it on so the
+        # inner stream's cleanup (request context, cursor) still runs
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def compress_response(response, min_size):
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.direct_passthrough):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        if encoding == "br":
+            response.set_data(brotli.compress(data, quality=5))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_compression(app):
+    @app.after_request
+    def _compress(response):
+        if not app.config.get("COMPRESSION_ENABLED", True):
+            return response
+        return compress_response(response, app.config.get("COMPRESSION_MIN_SIZE", 1024))
@@ -0,0 +1,122 @@
+"""
+Application-number typeahead.
+
+Front-desk staff type the start of a PEC number ("PEC48", "48") and get
+the first matching applications. Numbers sharing a decimal prefix are not
+contiguous in numeric order (48, 480-489, 4800-4899, ...), but each digit
+length is one contiguous range, so a prefix becomes a handful of ranges.
+They are resolved either by bisect over the in-memory sorted array below or
+by BETWEEN on the numeric_part index (repository.with_number_prefix).
+
+The array is loaded once per process and kept current by add()/remove()
+when this process reserves, inserts or deletes applications. Like the
+profile cache, a TTL bounds staleness from writes made by other worker
+processes.
+"""
+import bisect
+import re
+import threading
+import time
+
+INDEX_TTL = 300  # seconds
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+_PREFIX_RE = re.compile(r"^\s*(?:PEC)?\s*(\d+)\s*$", re.IGNORECASE)
+
+_numbers = None  # sorted distinct numeric_part values
+_expires_at = 0.0
+_lock = threading.Lock()
+
+
+def parse_prefix(term):
+    """
+    Digits of a typed application number ("PEC48", "pec 48", "48"), or None.
+    """
+    m = _PREFIX_RE.match(term or "")
+    if m is None or m.group(1).startswith("0"):
+        # Numbers are stored without leading zeros, so "0..." matches nothing
+        return None
+    return m.group(1)
+
+
+def prefix_ranges(digits, max_value):
+    """
+    Inclusive (lo, hi) numeric ranges of numbers starting with digits, in
+    ascending order, up to max_value.
+    """
+    base = int(digits)
+    scale = 1
+    while base * scale <= max_value:
+        yield base * scale, (base + 1) * scale - 1
+        scale *= 10
+
+
+# ---------------- In-memory index ----------------
+def _load(db):
+    cur = db.cursor()
+    cur.execute("SELECT DISTINCT numeric_part FROM applications WHERE numeric_part IS NOT NULL ORDER BY numeric_part")
+    return [r[0] for r in cur.fetchall()]
+
+
+def _get_numbers(db):
+    global _numbers, _expires_at
+    with _lock:
+        if _numbers is not None and _expires_at > time.monotonic():
+            return _numbers
+    numbers = _load(db)
+    with _lock:
+        _numbers = numbers
+        _expires_at = time.monotonic() + INDEX_TTL
+    return numbers
+
+
+def search(db, digits, limit=DEFAULT_LIMIT):
+    """
+    Up to limit numeric_part values starting with digits, ascending.
+    """
+    numbers = _get_numbers(db)
+    found = []
+    with _lock:
+        if not numbers:
+            return found
+        for lo, hi in prefix_ranges(digits, numbers[-1]):
+            start = bisect.bisect_left(numbers, lo)
+            end = bisect.bisect_right(numbers, hi, start)
+            found.extend(numbers[start:min(end, start + limit - len(found))])
+            if len(found) >= limit:
+                break
+    return found
+
+
+def add(number):
+    """
+    Record an inserted numeric_part (no-op until the index is loaded, or
+    when the number is already present).
+    """
+    if number is None:
+        return
+    with _lock:
+        if _numbers is not None:
+            i = bisect.bisect_left(_numbers, number)
+            if i == len(_numbers) or _numbers[i] != number:
+                _numbers.insert(i, number)
+
+
+def remove(number):
+    """
+    Forget a deleted numeric_part.
+    """
+    if number is None:
+        return
+    with _lock:
+        if _numbers is not None:
+            i = bisect.bisect_left(_numbers, number)
+            if i < len(_numbers) and _numbers[i] == number:
+                del _numbers[i]
+
+
+def invalidate():
+    global _numbers
+    with _lock:
+        _numbers = None
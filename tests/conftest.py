@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "myproject")
+sys.path.insert(0, PROJECT_DIR)
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """
+    The app module with a fresh, fully migrated users.db in a temp directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    import app
+
+    app.app.config.update(TESTING=True, MAINTENANCE_SCHEDULER=False, ADMISSION_ENABLED=False)
+    app.init_db()
+    # Per-process caches would otherwise carry over between test databases
+    app.typeahead.invalidate()
+    app.profiles._cache.clear()
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def coordinator_client(client):
+    with client.session_transaction() as s:
+        s['coordinator_id'] = 1
+        s['coordinator_name'] = "Test Coordinator"
+    return client
+
+
+@pytest.fixture
+def admin_client(client):
+    with client.session_transaction() as s:
+        s['admin_id'] = 1
+    return client
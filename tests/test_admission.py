@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def limited(app_module, monkeypatch):
+    limits = {name: {"concurrency": 1, "queue": 0, "timeout": 0} for name in ("exports", "search", "writes")}
+    app_module.app.config.update(ADMISSION_ENABLED=True, ADMISSION_LIMITS=limits)
+    monkeypatch.setattr(app_module.admission, "_controller", None)
+    return app_module
+
+
+def test_streamed_export_holds_slot_until_closed(limited, admin_client):
+    streaming = admin_client.get('/export/csv', buffered=False)
+    assert streaming.status_code == 200
+
+    assert admin_client.get('/export/csv').status_code == 429
+
+    streaming.get_data()
+    streaming.close()
+    assert admin_client.get('/export/csv').status_code == 200
+
+
+def test_plain_response_releases_slot(limited, admin_client):
+    for _ in range(3):
+        assert admin_client.get('/status_funnel').status_code == 200
+
+
+def test_file_download_releases_slot(limited, admin_client):
+    db = sqlite3.connect(limited.DATABASE)
+    db.execute("""
+        INSERT INTO applications (application_number, status, student_name, date_submitted)
+        VALUES ('PEC1', 'submitted', 'S1', '2026-01-01 10:00:00')
+    """)
+    db.commit()
+    db.close()
+
+    query = {'start_date': '2026-01-01', 'end_date': '2026-01-02'}
+    for _ in range(3):
+        r = admin_client.get('/download_pdf', query_string=query)
+        assert r.status_code == 200
+        r.close()
+
+
+def test_default_limits_keep_write_reserve(app_module):
+    limits = {name: dict(cfg, queue=0, timeout=0) for name, cfg in app_module.admission.DEFAULT_LIMITS.items()}
+    controller = app_module.admission.AdmissionController(
+        limits, app_module.admission.DEFAULT_TOTAL, app_module.admission.DEFAULT_WRITE_RESERVE)
+
+    exports = 0
+    while controller.enter("exports"):
+        exports += 1
+    search = 0
+    while controller.enter("search"):
+        search += 1
+    # The shared pool, not the per-class limits, stopped exports + search
+    assert exports + search == app_module.admission.DEFAULT_TOTAL - app_module.admission.DEFAULT_WRITE_RESERVE
+    assert search < limits["search"]["concurrency"]
+
+    for _ in range(app_module.admission.DEFAULT_WRITE_RESERVE):
+        assert controller.enter("writes")
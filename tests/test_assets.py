@@ -0,0 +1,33 @@
+import shutil
+
+import pytest
+
+import assets
+
+
+@pytest.fixture
+def built(app_module, tmp_path, monkeypatch):
+    static = tmp_path / "static"
+    shutil.copytree(app_module.app.static_folder, static, ignore=shutil.ignore_patterns(assets.DIST_DIRNAME))
+    monkeypatch.setattr(app_module.app, "static_folder", str(static))
+    monkeypatch.setattr(assets, "_manifest", None)
+    assets.build(str(static), widths=(480,))
+    yield app_module
+    assets._manifest = None
+
+
+def test_width_variant_is_upgraded_to_modern_format(built, client):
+    with built.app.test_request_context():
+        url = assets.asset_url("homepage.jpg", width=480)
+    assert url.endswith(".480.jpg")
+
+    r = client.get(url, headers={"Accept": "image/avif,image/webp,*/*"})
+    assert r.status_code == 200
+    assert r.mimetype == "image/avif"
+    assert "Accept" in r.headers["Vary"]
+
+    r = client.get(url, headers={"Accept": "image/webp,*/*"})
+    assert r.mimetype == "image/webp"
+
+    r = client.get(url, headers={"Accept": "*/*"})
+    assert r.mimetype == "image/jpeg"
@@ -0,0 +1,50 @@
+import sqlite3
+
+import dedupe
+
+
+def test_name_key_is_shared_with_and_without_mobile():
+    with_mobile = dedupe.keys("Srinivas K", "Ramesh", "+91 98765 43210")
+    without_mobile = dedupe.keys("K. Sreenivas", "Ramesh", None)
+    assert with_mobile[0] == without_mobile[0]
+    assert with_mobile[1] == "9876543210|S651"
+    assert without_mobile[1] is None
+
+
+def test_form_post_and_json_save_are_reported(app_module, coordinator_client):
+    r = coordinator_client.post('/application_form', data={
+        'application_number': 'PEC7001', 'student_name': 'Srinivas', 'father_name': 'Ramesh'})
+    assert r.status_code == 200
+
+    r = coordinator_client.post('/save_application', json={
+        'application_number': 'PEC7002', 'student_name': 'Sreenivas', 'father_name': 'Ramesh',
+        'mobile': '9876543210'})
+    assert [d['application_number'] for d in r.json['possible_duplicates']] == ['PEC7001']
+
+
+def test_mobile_key_matches_despite_father_spelling(app_module, coordinator_client):
+    coordinator_client.post('/save_application', json={
+        'application_number': 'PEC7001', 'student_name': 'Lakshmi', 'father_name': 'Venkat Rao',
+        'mobile': '9876543210'})
+    r = coordinator_client.post('/save_application', json={
+        'application_number': 'PEC7002', 'student_name': 'Laxmi', 'father_name': 'V. Rao',
+        'mobile': '09876543210'})
+    assert [d['application_number'] for d in r.json['possible_duplicates']] == ['PEC7001']
+
+    with coordinator_client.session_transaction() as s:
+        s['admin_id'] = 1
+    clusters = coordinator_client.get('/duplicate_report').json['clusters']
+    assert [(c['match'], c['application_numbers']) for c in clusters] == [('mobile', ['PEC7001', 'PEC7002'])]
+
+
+def test_form_post_recomputes_keys_via_sql_function(app_module, coordinator_client):
+    # The form path updates a reserved row and uses the fingerprint SQL functions
+    coordinator_client.get('/application_form')
+    db = sqlite3.connect(app_module.DATABASE)
+    number = "PEC%d" % db.execute("SELECT last_number FROM application_sequence").fetchone()[0]
+    r = coordinator_client.post('/application_form', data={
+        'application_number': number, 'student_name': 'Ravi', 'father_name': 'Kumar', 'mobile': '9876543210'})
+    assert r.status_code == 200
+    row = db.execute("SELECT status, mobile_fingerprint FROM applications WHERE application_number = ?",
+                     (number,)).fetchone()
+    assert row == ('submitted', '9876543210|R100')
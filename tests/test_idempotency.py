@@ -0,0 +1,34 @@
+import sqlite3
+
+FORM = {'application_number': 'PEC1', 'student_name': "Student", 'father_name': "Father"}
+
+
+def _save(client, key, data=FORM):
+    return client.post('/save_application', json=data, headers={'Idempotency-Key': key})
+
+
+def test_replay_returns_stored_response_without_writing(app_module, coordinator_client):
+    first = _save(coordinator_client, 'k1')
+    assert first.status_code == 200
+    assert 'Idempotent-Replayed' not in first.headers
+
+    db = sqlite3.connect(app_module.DATABASE)
+    before = db.execute("SELECT change_seq, last_modified FROM applications WHERE application_number = 'PEC1'").fetchone()
+
+    replay = _save(coordinator_client, 'k1')
+    assert replay.status_code == 200
+    assert replay.headers['Idempotent-Replayed'] == 'true'
+    assert replay.get_data() == first.get_data()
+    after = db.execute("SELECT change_seq, last_modified FROM applications WHERE application_number = 'PEC1'").fetchone()
+    assert after == before
+
+
+def test_key_reused_with_different_body_is_rejected(app_module, coordinator_client):
+    assert _save(coordinator_client, 'k1').status_code == 200
+
+    r = _save(coordinator_client, 'k1', dict(FORM, student_name="Someone else"))
+    assert r.status_code == 422
+
+    db = sqlite3.connect(app_module.DATABASE)
+    name = db.execute("SELECT student_name FROM applications WHERE application_number = 'PEC1'").fetchone()[0]
+    assert name == "Student"
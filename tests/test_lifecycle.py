@@ -0,0 +1,53 @@
+import sqlite3
+
+
+def _reserve(client, app_module):
+    client.get('/application_form')
+    with sqlite3.connect(app_module.DATABASE) as db:
+        return "PEC%d" % db.execute("SELECT last_number FROM application_sequence").fetchone()[0]
+
+
+def test_upsert_moves_reserved_rows_to_submitted(app_module, coordinator_client):
+    numbers = [_reserve(coordinator_client, app_module) for _ in range(3)]
+    for i, number in enumerate(numbers):
+        r = coordinator_client.post('/save_application', json={
+            'application_number': number, 'student_name': f"Student {i}", 'father_name': "Father"})
+        assert r.status_code == 200, r.json
+
+    db = sqlite3.connect(app_module.DATABASE)
+    counts = dict(db.execute("SELECT status, count FROM status_counts"))
+    assert counts['reserved'] == 0
+    assert counts['submitted'] == 3
+    moves = db.execute("SELECT from_status, to_status FROM status_history WHERE from_status IS NOT NULL").fetchall()
+    assert moves == [('reserved', 'submitted')] * 3
+
+
+def test_upsert_moves_legacy_null_status_to_submitted(app_module, coordinator_client):
+    db = sqlite3.connect(app_module.DATABASE)
+    db.execute("INSERT INTO applications (application_number, student_name) VALUES ('PEC7', 'Old')")
+    db.execute("UPDATE applications SET status = NULL WHERE application_number = 'PEC7'")
+    db.commit()
+
+    r = coordinator_client.post('/save_application', json={
+        'application_number': 'PEC7', 'student_name': "Student", 'father_name': "Father"})
+    assert r.status_code == 200, r.json
+    status = db.execute("SELECT status FROM applications WHERE application_number = 'PEC7'").fetchone()[0]
+    assert status == 'submitted'
+
+
+def test_transition_and_funnel(app_module, coordinator_client):
+    number = _reserve(coordinator_client, app_module)
+    coordinator_client.post('/save_application', json={
+        'application_number': number, 'student_name': "A", 'father_name': "B"})
+    with coordinator_client.session_transaction() as s:
+        s['admin_id'] = 1
+
+    assert coordinator_client.post('/application_status', json={
+        'application_number': number, 'status': 'allotted'}).status_code == 409
+    assert coordinator_client.post('/application_status', json={
+        'application_number': number, 'status': 'verified'}).status_code == 200
+
+    stages = {s['status']: s for s in coordinator_client.get('/status_funnel').json['stages']}
+    assert stages['verified']['count'] == 1
+    assert stages['submitted']['count'] == 0
+    assert stages['submitted']['time_in_stage']['completed'] == 1
@@ -0,0 +1,33 @@
+import sqlite3
+
+
+def test_coordinator_backfill_skips_ambiguous_names(app_module, capsys):
+    db = sqlite3.connect(app_module.DATABASE)
+    db.row_factory = sqlite3.Row
+    db.executemany("INSERT INTO coordinators (id, first_name, last_name) VALUES (?, ?, ?)",
+                   [(1, "Mahidhar", "Gali"), (2, "vinod", "g"), (4, "Mahidhar", "Gali")])
+    db.executemany("INSERT INTO applications (application_number, coordinator) VALUES (?, ?)",
+                   [("PEC1", "Mahidhar Gali"), ("PEC2", "vinod g"), ("PEC3", "nobody")])
+    db.execute("UPDATE applications SET coordinator_id = NULL")
+
+    app_module.migrate_v3(db.cursor())
+
+    owners = dict(db.execute("SELECT application_number, coordinator_id FROM applications"))
+    assert owners == {"PEC1": None, "PEC2": 2, "PEC3": None}
+    assert "Mahidhar Gali" in capsys.readouterr().out
+
+
+def test_duplicate_numbers_resolved_before_unique_index(app_module):
+    db = sqlite3.connect(app_module.DATABASE)
+    db.execute("DROP INDEX idx_applications_number")
+    db.executemany("INSERT INTO applications (id, application_number, status) VALUES (?, ?, ?)",
+                   [(1, "PEC1", "submitted"), (2, "PEC1", "reserved"), (3, "PEC1", "verified"),
+                    (4, "PEC2", "reserved"), (5, "PEC2", "reserved")])
+
+    app_module.migrate_v7(db.cursor())
+
+    rows = db.execute("SELECT id, application_number FROM applications ORDER BY id").fetchall()
+    # PEC1: newest non-reserved row keeps the number, the reservation is
+    # dropped, the older submission is renamed; PEC2: newest reservation wins
+    assert rows == [(1, "PEC1-dup1"), (3, "PEC1"), (5, "PEC2")]
+    assert db.execute("PRAGMA index_info(idx_applications_number)").fetchall()
@@ -0,0 +1,46 @@
+import io
+import os
+import signal
+
+from pypdf import PdfReader
+from reportlab import rl_config
+
+import pdf_report
+
+HEADERS = ["Application No", "Student", "Branch"]
+ROWS = [[f"PEC{n}", f"Student {n}", "CSE"] for n in range(300)]
+
+
+def _pages(data):
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+def test_page_streams_skip_ascii85_without_global_change():
+    before = rl_config.useA85
+    out = io.BytesIO()
+    pdf_report.render(HEADERS, ROWS, out, parallel=False)
+    assert b"ASCII85Decode" not in out.getvalue()
+    assert b"FlateDecode" in out.getvalue()
+    assert rl_config.useA85 == before
+
+
+def test_broken_pool_falls_back_and_is_replaced():
+    serial = io.BytesIO()
+    pdf_report.render(HEADERS, ROWS, serial, parallel=False)
+
+    pool = pdf_report.get_pool(2)
+    pool.submit(int, 0).result()  # start the workers
+    for pid in list(pool._processes):
+        os.kill(pid, signal.SIGKILL)
+
+    out = io.BytesIO()
+    pdf_report.render(HEADERS, ROWS, out, parallel=True, workers=2)
+    assert _pages(out.getvalue()) == _pages(serial.getvalue())
+
+    fresh = pdf_report.get_pool(2)
+    assert fresh is not pool
+    out = io.BytesIO()
+    pdf_report.render(HEADERS, ROWS, out, parallel=True, workers=2)
+    assert _pages(out.getvalue()) == _pages(serial.getvalue())
+    assert pdf_report.get_pool(3) is not fresh
+    pdf_report.discard_pool(pdf_report.get_pool(3))
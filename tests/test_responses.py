@@ -0,0 +1,52 @@
+import gzip
+import json
+import sqlite3
+
+
+def test_small_json_is_not_compressed(app_module, admin_client):
+    app_module.app.config["COMPRESSION_MIN_SIZE"] = 1 << 20
+    r = admin_client.get('/status_funnel', headers={'Accept-Encoding': 'gzip'})
+    assert r.status_code == 200
+    assert 'Content-Encoding' not in r.headers
+    assert 'stages' in r.json
+
+
+def test_large_json_is_gzipped(app_module, admin_client):
+    app_module.app.config["COMPRESSION_MIN_SIZE"] = 16
+    r = admin_client.get('/status_funnel', headers={'Accept-Encoding': 'gzip'})
+    assert r.status_code == 200
+    assert r.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in r.headers['Vary']
+    json.loads(gzip.decompress(r.get_data()))
+
+
+def test_streamed_list_is_gzipped(app_module, coordinator_client):
+    db = sqlite3.connect(app_module.DATABASE)
+    db.executemany(
+        "INSERT INTO applications (application_number, student_name, coordinator_id) VALUES (?, ?, 1)",
+        [(f"PEC{n}", f"Student {n}") for n in range(1, 501)])
+    db.commit()
+
+    r = coordinator_client.get('/get_coordinator_applications', headers={'Accept-Encoding': 'gzip'})
+    assert r.status_code == 200
+    assert r.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in r.headers
+    body = json.loads(gzip.decompress(r.get_data()))
+    assert len(body['applications']) == 500
+
+
+def test_compressed_stream_closes_inner_iterable(app_module):
+    closed = []
+
+    def inner():
+        try:
+            yield b'{"a":'
+            yield b'1}'
+        finally:
+            closed.append(True)
+
+    chunks = inner()
+    stream = app_module.responses._compress_stream(chunks, "gzip")
+    next(stream)
+    stream.close()
+    assert closed == [True]
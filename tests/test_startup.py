@@ -0,0 +1,6 @@
+def test_cold_start_within_budget(app_module):
+    elapsed, rss_mb, eager = app_module.measure_startup()
+    config = app_module.app.config
+    assert eager == [], f"export libraries imported at startup: {eager}"
+    assert elapsed <= config["STARTUP_BUDGET_SECONDS"], f"import took {elapsed:.3f}s"
+    assert rss_mb <= config["STARTUP_BUDGET_RSS_MB"], f"peak RSS {rss_mb:.1f} MB"
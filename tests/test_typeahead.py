@@ -0,0 +1,33 @@
+import sqlite3
+
+import pytest
+
+NUMBERS = (4, 5, 45, 48, 50, 480, 488, 1048, 4880, 4888)
+
+
+@pytest.fixture(params=[True, False], ids=["in_memory", "sql"])
+def typeahead_client(request, app_module, admin_client):
+    app_module.app.config["TYPEAHEAD_IN_MEMORY"] = request.param
+    db = sqlite3.connect(app_module.DATABASE)
+    db.executemany("INSERT INTO applications (application_number, numeric_part) VALUES (?, ?)",
+                   [(f"PEC{n}", n) for n in NUMBERS])
+    db.commit()
+    return admin_client
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("4", [4, 45, 48, 480, 488, 4880, 4888]),
+    ("48", [48, 480, 488, 4880, 4888]),
+    ("PEC488", [488, 4880, 4888]),
+    ("0", []),
+])
+def test_prefix_matches(typeahead_client, q, expected):
+    r = typeahead_client.get('/application_typeahead', query_string={'q': q})
+    assert r.status_code == 200
+    assert r.json["query"] == q
+    assert [m["application_number"] for m in r.json["matches"]] == [f"PEC{n}" for n in expected]
+
+
+def test_limit_keeps_lowest_numbers(typeahead_client):
+    r = typeahead_client.get('/application_typeahead', query_string={'q': '4', 'limit': 2})
+    assert [m["application_number"] for m in r.json["matches"]] == ["PEC4", "PEC45"]